@@ -23,6 +23,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'dms.metrics.MetricsMiddleware',  # first, so its timings cover the whole stack
+    'dms.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,17 +47,24 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'dms.context_processors.notifications',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
+# Connections are kept for CONN_MAX_AGE seconds and checked before reuse, so a restarted database
+# server costs one failed check instead of a failed request. Only WSGI workers reuse them (config.wsgi
+# defaults DB_CONN_MAX_AGE to 60); under ASGI each request opens its own, so persistent ones pile up
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -68,8 +77,43 @@ DATABASES = {
 #         'PASSWORD': os.environ.get('DB_PASSWORD', ''),
 #         'HOST': os.environ.get('DB_HOST', 'localhost'),
 #         'PORT': os.environ.get('DB_PORT', '5432'),
+#         'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+#         'CONN_HEALTH_CHECKS': True,
 #     }
 # }
+# and a streaming replica of it:
+# DATABASES['replica'] = {**DATABASES['default'], 'HOST': os.environ.get('DB_REPLICA_HOST', 'localhost'),
+#                         'PORT': os.environ.get('DB_REPLICA_PORT', '5433'), 'TEST': {'MIRROR': 'default'}}
+
+# Local replica testing: DB_SQLITE_REPLICA=replica.sqlite3, refreshed with `manage.py sync_sqlite_replicas`
+if os.environ.get('DB_SQLITE_REPLICA'):
+    DATABASES['replica'] = {**DATABASES['default'], 'NAME': BASE_DIR / os.environ['DB_SQLITE_REPLICA'],
+                            'TEST': {'MIRROR': 'default'}}
+
+# GET requests to DMS_REPLICA_VIEWS read from one of DMS_READ_REPLICAS (see dms/replicas.py); writes, and
+# reads after a write, use 'default'. DMS_REPLICA_LAG_SECONDS is the replication lag the app tolerates.
+DATABASE_ROUTERS = ['dms.replicas.ReplicaRouter']
+DMS_READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DMS_REPLICA_VIEWS = ['dashboard', 'document_list', 'document_detail', 'notifications_count']
+DMS_REPLICA_LAG_SECONDS = 10
+
+# Unread counters, page data (dms.pagecache) and other derived data are cached here. With several workers
+# the cache must be shared so invalidations reach every process: set REDIS_URL (needs the redis package)
+# or use Memcached/FileBasedCache. The per-process locmem default suits a single runserver.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
 
 AUTH_USER_MODEL = 'dms.User'
 
@@ -109,3 +153,57 @@ MESSAGE_TAGS = {
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+# Uploads stream to disk (hashed as they arrive) and are stored once per SHA-256, see dms/storage.py.
+# The temp dir sits under MEDIA_ROOT so finished uploads are renamed into place, not copied.
+FILE_UPLOAD_HANDLERS = ['dms.storage.HashingUploadHandler']
+DMS_UPLOAD_TEMP_DIR = MEDIA_ROOT / 'tmp'
+
+# Reference numbers: DOC-<year>-<n> by default, DOC-<dept code>-<year>-<n> when True
+DMS_REFERENCE_PER_DEPARTMENT = False
+
+# Write notification fan-out from a background thread after the request's transaction commits
+DMS_DEFER_NOTIFICATIONS = False
+DMS_NOTIFICATION_WORKERS = 2
+
+# Push notification updates over Server-Sent Events instead of polling /notifications/count/.
+# Needs an ASGI server (e.g. `uvicorn config.asgi:application`); under WSGI each stream holds a worker.
+DMS_NOTIFICATION_STREAM = False
+DMS_NOTIFICATION_STREAM_RESYNC = 25  # seconds
+
+# archive_notifications moves read notifications older than this out of the hot table
+DMS_NOTIFICATION_RETENTION_DAYS = 90
+
+# archive_document_logs: logs of documents archived longer than this go to compressed segment files
+DMS_LOG_ARCHIVE_AFTER_DAYS = 180
+DMS_LOG_ARCHIVE_DIR = BASE_DIR / 'log_archive'
+DMS_LOG_SEGMENT_SIZE = 64 * 1024 * 1024
+
+# Document downloads: None streams through Django (os.sendfile under gunicorn). 'nginx' answers with
+# X-Accel-Redirect to DMS_SENDFILE_URL + <file name>, which must be an `internal` location aliased to
+# MEDIA_ROOT; 'apache' answers with X-Sendfile and the absolute path (mod_xsendfile).
+DMS_SENDFILE_BACKEND = None
+DMS_SENDFILE_URL = '/protected-media/'
+
+# Previews, thumbnails and cleaned-up signatures are rendered in this many worker processes after upload
+# (0 renders in a background thread instead). PDF previews need poppler's pdftoppm; set to None to skip them.
+DMS_DERIVATIVE_WORKERS = 2
+DMS_PDFTOPPM = 'pdftoppm'
+
+# Attachment text for search is extracted in this many worker processes after upload (0: in a background
+# thread). PDFs need poppler's pdftotext; DOCX and plain text need nothing extra.
+DMS_EXTRACTION_WORKERS = 2
+DMS_PDFTOTEXT = 'pdftotext'
+DMS_EXTRACT_MAX_CHARS = 1_000_000
+
+# Request latency, query and template metrics, served in Prometheus format at /metrics/ to logged-in
+# superusers and to scrapers sending `Authorization: Bearer <DMS_METRICS_TOKEN>`. DMS_METRICS_ALLOWED_IPS
+# opts addresses in without a token; leave it empty behind a proxy, where every request comes from the
+# proxy. A request running more than DMS_QUERY_BUDGET queries is logged as a warning on 'dms.metrics'
+# with its SQL; None turns the check off.
+DMS_METRICS_TOKEN = os.environ.get('DMS_METRICS_TOKEN')
+DMS_METRICS_ALLOWED_IPS = []
+DMS_QUERY_BUDGET = 50
+
+# Dashboard summaries, first list pages and detail timelines are cached for this many seconds, and dropped
+# as soon as a write touches their scope. Off (0) unless the cache is shared: see the dms.E001 check.
+DMS_PAGE_CACHE_TIMEOUT = 300 if os.environ.get('REDIS_URL') else 0
@@ -2,4 +2,6 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# WSGI threads serve request after request, so keep their connections (see DATABASES in settings)
+os.environ.setdefault('DB_CONN_MAX_AGE', '60')
 application = get_wsgi_application()
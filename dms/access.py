@@ -0,0 +1,56 @@
+# access.py
+"""
+The DocumentAccess table behind Document.objects.visible_to().
+
+A document is visible to the users who created it or are assigned it and
+to the offices it came from or is in: the 'user' and 'department' scopes
+of dms.stats.document_scopes, without the status. Saves are mirrored by a
+signal; perform_bulk and the manifest intake call apply_changes()
+themselves, and rebuild() recomputes the table (used by the migration,
+the benchmark seeder and the rebuild_document_access command).
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+
+from .models import Document, DocumentAccess
+
+SOURCES = (
+    ('user', 'created_by_id'),
+    ('user', 'assigned_to_id'),
+    ('department', 'origin_department_id'),
+    ('department', 'current_department_id'),
+)
+
+
+def principals(stat_keys):
+    """{(scope, scope_id)} that may see a document with these dms.stats keys."""
+    return {(scope, scope_id) for scope, scope_id, _ in stat_keys if scope != 'all'}
+
+
+def apply_changes(changes):
+    """Apply ``(document_id, old_stat_keys, new_stat_keys)`` moves: one DELETE per lost principal, one INSERT."""
+    removed = defaultdict(list)
+    added = []
+    for pk, old_keys, new_keys in changes:
+        old, new = principals(old_keys), principals(new_keys)
+        for principal in old - new:
+            removed[principal].append(pk)
+        added.extend(DocumentAccess(document_id=pk, scope=scope, scope_id=scope_id) for scope, scope_id in new - old)
+    for (scope, scope_id), ids in removed.items():
+        DocumentAccess.objects.filter(scope=scope, scope_id=scope_id, document_id__in=ids).delete()
+    if added:
+        DocumentAccess.objects.bulk_create(added, ignore_conflicts=True)
+
+
+def rebuild(document_model=Document, access_model=DocumentAccess):
+    """Recompute the whole table from the documents with one INSERT ... SELECT; returns the row count."""
+    qn = connection.ops.quote_name
+    docs, table = qn(document_model._meta.db_table), qn(access_model._meta.db_table)
+    select = ' UNION '.join(
+        f"SELECT id, '{scope}', {qn(column)} FROM {docs} WHERE {qn(column)} IS NOT NULL" for scope, column in SOURCES
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(f'INSERT INTO {table} (document_id, scope, scope_id) {select}')
+        return cursor.rowcount
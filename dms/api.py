@@ -0,0 +1,341 @@
+# api.py
+"""
+Read-only JSON API for integrations.
+
+Every list is cursor-paginated (``?after=`` / ``?before=`` tokens from the
+``next`` / ``previous`` links) and accepts ``?fields=a,b,c``. Each public
+field declares the columns it needs, the relations to join and the
+relations to prefetch, so a narrow ``fields=`` turns into a narrow
+``.only()`` query instead of whole rows. Documents are limited to
+Document.objects.visible_to() the caller, like every other view.
+"""
+import base64
+import binascii
+from functools import wraps
+
+from django.contrib.auth import authenticate
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.views.decorators.http import require_GET
+
+from . import timeline
+from .forms import DocumentSearchForm
+from .logarchive import ArchivedLog, read_archived_logs
+from .models import Document, DocumentLog, DocumentRouting, User
+from .pagination import InvalidCursor, KeysetPaginator, RankedPaginator
+from .queries import search_filtered
+
+MAX_PAGE_SIZE = 100
+BASIC_AUTH_CACHE_SECONDS = 300
+
+
+class Field:
+    def __init__(self, value, only=(), select=(), prefetch=()):
+        self.value = value
+        self.only = only
+        self.select = select
+        self.prefetch = prefetch
+
+
+def _column(name, display=False):
+    if display:
+        return Field(lambda obj: {'value': getattr(obj, name), 'label': getattr(obj, f'get_{name}_display')()},
+                     only=(name,))
+    return Field(lambda obj: getattr(obj, name), only=(name,))
+
+
+def _user(user):
+    if user is None:
+        return None
+    return {'id': user.pk, 'username': user.username, 'name': user.get_full_name()}
+
+
+def _department(department):
+    if department is None:
+        return None
+    return {'id': department.pk, 'code': department.code, 'name': department.name}
+
+
+USER_COLUMNS = ('id', 'username', 'first_name', 'last_name')
+DEPARTMENT_COLUMNS = ('id', 'code', 'name')
+
+
+def _related(name, columns, serialize, prefix=''):
+    path = f'{prefix}{name}'
+    return Field(lambda obj: serialize(getattr(obj, name)),
+                 only=(path, *(f'{path}__{c}' for c in columns)), select=(path,))
+
+
+def _user_field(name):
+    return _related(name, USER_COLUMNS, _user)
+
+
+def _department_field(name):
+    return _related(name, DEPARTMENT_COLUMNS, _department)
+
+
+def _log(log):
+    if isinstance(log, ArchivedLog):
+        # Archived rows keep the user's id and display name, not the User
+        user = {'id': log.user_id, 'name': log.user} if log.user_id else None
+    else:
+        user = _user(log.user)
+    return {'action': log.action, 'label': log.get_action_display(), 'notes': log.notes,
+            'timestamp': log.timestamp, 'user': user}
+
+
+def _routing(routing):
+    return {'id': routing.pk, 'from_department': _department(routing.from_department),
+            'to_department': _department(routing.to_department), 'forwarded_by': _user(routing.forwarded_by),
+            'forwarded_at': routing.forwarded_at, 'notes': routing.notes, 'completed': routing.completed}
+
+
+def _timeline_entry(entry):
+    user = {'id': entry.user_id, 'username': entry.username, 'name': entry.user} if entry.user_id else None
+    return {'kind': entry.kind, 'action': entry.action, 'label': entry.get_action_display(), 'notes': entry.notes,
+            'timestamp': entry.timestamp, 'user': user, 'from_department': entry.from_department,
+            'to_department': entry.to_department}
+
+
+def _log_queryset():
+    return DocumentLog.objects.select_related('user').only(
+        'document', 'action', 'notes', 'timestamp', 'user', *(f'user__{c}' for c in USER_COLUMNS))
+
+
+def _routing_queryset():
+    return DocumentRouting.objects.select_related('from_department', 'to_department', 'forwarded_by').order_by(
+        'forwarded_at')
+
+
+DOCUMENT_FIELDS = {
+    'id': _column('id'),
+    'reference_number': _column('reference_number'),
+    'title': _column('title'),
+    'source': _column('source', display=True),
+    'classification': _column('classification', display=True),
+    'status': _column('status', display=True),
+    'action_type': _column('action_type'),
+    'description': _column('description'),
+    'correspondent_name': _column('correspondent_name'),
+    'correspondent_agency': _column('correspondent_agency'),
+    'created_at': _column('created_at'),
+    'updated_at': _column('updated_at'),
+    'logged_at': _column('logged_at'),
+    'created_by': _user_field('created_by'),
+    'assigned_to': _user_field('assigned_to'),
+    'origin_department': _department_field('origin_department'),
+    'current_department': _department_field('current_department'),
+    'file': Field(lambda doc: {'name': doc.file_name, 'url': reverse('document_file', args=[doc.pk])}
+                  if doc.file else None, only=('file', 'file_name')),
+    'esigned': Field(lambda doc: bool(doc.esignature), only=('esignature',)),
+    'logs': Field(lambda doc: [_log(log) for log in doc.logs.all()],
+                  prefetch=(Prefetch('logs', queryset=_log_queryset()),)),
+    'routings': Field(lambda doc: [_routing(r) for r in doc.routings.all()],
+                      prefetch=(Prefetch('routings', queryset=_routing_queryset()),)),
+}
+DOCUMENT_LIST_DEFAULT = ('id', 'reference_number', 'title', 'status', 'source', 'current_department',
+                         'created_at', 'updated_at')
+DOCUMENT_DETAIL_DEFAULT = tuple(f for f in DOCUMENT_FIELDS if f not in ('logs', 'routings'))
+
+NOTIFICATION_FIELDS = {
+    'id': _column('id'),
+    'message': _column('message'),
+    'is_read': _column('is_read'),
+    'created_at': _column('created_at'),
+    'document': _related('document', ('id', 'reference_number', 'title'),
+                         lambda d: d and {'id': d.pk, 'reference_number': d.reference_number, 'title': d.title}),
+}
+NOTIFICATION_DEFAULT = tuple(NOTIFICATION_FIELDS)
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def api_login_required(view):
+    """Session login or HTTP Basic credentials; a JSON 401 instead of a redirect to the login page."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            user = _basic_auth(request)
+            if user is None:
+                response = _error('Authentication required.', status=401)
+                response['WWW-Authenticate'] = 'Basic realm="pm_system"'
+                return response
+            request.user = user
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as exc:
+            return _error(str(exc))
+    return wrapper
+
+
+def _password_stamp(user):
+    return salted_hmac('dms.api.password_stamp', user.password).hexdigest()
+
+
+def _basic_auth(request):
+    header = request.headers.get('Authorization', '')
+    scheme, _, credentials = header.partition(' ')
+    if scheme.lower() != 'basic':
+        return None
+    # authenticate() runs the full password hash; remember a verified header for a few minutes instead
+    key = f'dms:api:basic:{salted_hmac("dms.api.basic_auth", header).hexdigest()}'
+    cached = cache.get(key)
+    if cached is not None:
+        pk, stamp = cached
+        user = User.objects.filter(pk=pk, is_active=True).first()
+        # A changed password changes the stamp, which retires the cached credential
+        if user is not None and constant_time_compare(_password_stamp(user), stamp):
+            return user
+    try:
+        username, _, password = base64.b64decode(credentials).decode().partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    user = authenticate(request, username=username, password=password)
+    if user is None or not user.is_active:
+        return None
+    cache.set(key, (user.pk, _password_stamp(user)), BASIC_AUTH_CACHE_SECONDS)
+    return user
+
+
+def _fields(request, available, default):
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(default)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise BadRequest(f'Unknown field(s): {", ".join(unknown)}. Available: {", ".join(available)}.')
+    return names
+
+
+def _shape(queryset, available, names, always=('id',)):
+    """Narrow ``queryset`` to what ``names`` need: .only() columns, joins and prefetches."""
+    only, select, prefetch = set(always), set(), []
+    for name in names:
+        field = available[name]
+        only.update(field.only)
+        select.update(field.select)
+        prefetch.extend(field.prefetch)
+    return queryset.select_related(*select).prefetch_related(*prefetch).only(*only)
+
+
+def _serialize(obj, available, names):
+    return {name: available[name].value(obj) for name in names}
+
+
+def _page_size(request):
+    try:
+        return max(1, min(int(request.GET.get('limit', 25)), MAX_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('limit must be an integer.')
+
+
+def _page(request, paginator):
+    try:
+        return paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+    except InvalidCursor:
+        raise BadRequest('Invalid cursor.')
+
+
+def _link(request, key, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    params[key] = cursor
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def _paginated(request, page, serialize):
+    return JsonResponse({
+        'results': [serialize(obj) for obj in page],
+        'next': _link(request, 'after', page.next_cursor),
+        'previous': _link(request, 'before', page.prev_cursor),
+    })
+
+
+def _documents(request):
+    return Document.objects.visible_to(request.user)
+
+
+# ─── ENDPOINTS ────────────────────────────────────────────────────────────────
+
+@require_GET
+@api_login_required
+def documents(request):
+    names = _fields(request, DOCUMENT_FIELDS, DOCUMENT_LIST_DEFAULT)
+    docs = _documents(request)
+    form = DocumentSearchForm(request.GET)
+    if not form.is_valid():
+        raise BadRequest(form.errors.as_text())
+    docs, hits = search_filtered(docs, form.cleaned_data)
+
+    per_page = _page_size(request)
+    if hits is None:
+        paginator = KeysetPaginator(_shape(docs, DOCUMENT_FIELDS, names, always=('id', 'created_at')), per_page)
+    else:
+        paginator = RankedPaginator(hits, _shape(docs, DOCUMENT_FIELDS, names), per_page)
+    return _paginated(request, _page(request, paginator), lambda doc: _serialize(doc, DOCUMENT_FIELDS, names))
+
+
+@require_GET
+@api_login_required
+def document(request, pk):
+    names = _fields(request, DOCUMENT_FIELDS, DOCUMENT_DETAIL_DEFAULT)
+    doc = get_object_or_404(_shape(_documents(request), DOCUMENT_FIELDS, names), pk=pk)
+    return JsonResponse(_serialize(doc, DOCUMENT_FIELDS, names))
+
+
+@require_GET
+@api_login_required
+def document_logs(request, pk):
+    """Newest first; ``?archived=1`` returns the logs moved to the archive segments instead."""
+    doc = get_object_or_404(_documents(request).only('pk'), pk=pk)
+    if request.GET.get('archived') == '1':
+        return JsonResponse({'results': [_log(log) for log in read_archived_logs(doc)], 'next': None,
+                             'previous': None})
+    paginator = KeysetPaginator(_log_queryset().filter(document=doc), _page_size(request), field='timestamp')
+    return _paginated(request, _page(request, paginator), _log)
+
+
+@require_GET
+@api_login_required
+def document_routings(request, pk):
+    doc = get_object_or_404(_documents(request).only('pk'), pk=pk)
+    return JsonResponse({'results': [_routing(r) for r in _routing_queryset().filter(document=doc)]})
+
+
+@require_GET
+@api_login_required
+def document_timeline(request, pk):
+    """Logs, routings and archived logs merged, newest first; ``next`` loads the older entries."""
+    doc = get_object_or_404(_documents(request).only('pk', 'status'), pk=pk)
+    try:
+        page = timeline.page(doc, after=request.GET.get('after'), size=_page_size(request))
+    except InvalidCursor:
+        raise BadRequest('Invalid cursor.')
+    return _paginated(request, page, _timeline_entry)
+
+
+@require_GET
+@api_login_required
+def notifications(request):
+    names = _fields(request, NOTIFICATION_FIELDS, NOTIFICATION_DEFAULT)
+    qs = request.user.notifications.all()
+    if request.GET.get('unread') == '1':
+        qs = qs.filter(is_read=False)
+    # recipient is set on every row by the related manager, so it must not be deferred
+    qs = _shape(qs, NOTIFICATION_FIELDS, names, always=('id', 'created_at', 'recipient'))
+    page = _page(request, KeysetPaginator(qs, _page_size(request)))
+    return _paginated(request, page, lambda n: _serialize(n, NOTIFICATION_FIELDS, names))
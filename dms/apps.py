@@ -5,3 +5,6 @@ class DmsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dms'
     verbose_name = 'Document Management System'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,499 @@
+# benchmark.py
+"""
+Synthetic load for the document workflow.
+
+seed() fills the database with a production-sized dataset: departments,
+users, documents with their logs and routings, notifications, and a few
+documents with very long histories. Rows go in with bulk_create in
+fixed-size chunks. The tables those inserts skip (dashboard counters,
+visibility table, unread counters, search index) are rebuilt once at
+the end.
+
+run() replays every route in dms.urls through the test client. Each
+virtual user gets its own thread, client and database connection. For
+each scenario it records latency percentiles, query counts, status codes
+and the process's peak RSS. compare() diffs a run against a saved
+baseline. The seed_benchmark_data and run_benchmark commands wrap both.
+"""
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import access, search, stats, unread
+from .models import Department, Document, DocumentLog, DocumentRouting, Notification, User
+from .references import reserve_reference_numbers
+
+CODE_PREFIX = 'BENCH'
+PASSWORD = 'benchmark'
+STATUS_WEIGHTS = {
+    'draft': 4, 'pending_review': 20, 'return_for_revision': 4, 'approved': 5, 'rejected': 2,
+    'esigned': 8, 'released': 6, 'returned': 4, 'archived': 47,
+}
+LOG_ACTIONS = [action for action, _ in DocumentLog.ACTION_CHOICES]
+WORDS = ('budget', 'procurement', 'memorandum', 'request', 'travel', 'payroll', 'audit', 'contract',
+         'infrastructure', 'health', 'education', 'road', 'bridge', 'permit', 'zoning', 'report',
+         'quarterly', 'annual', 'supplemental', 'appropriation', 'clearance', 'endorsement', 'waiver',
+         'inventory', 'vehicle', 'equipment', 'training', 'seminar', 'disaster', 'relief', 'water',
+         'livelihood', 'agriculture', 'fisheries', 'tourism', 'tax', 'ordinance', 'resolution')
+
+
+@contextmanager
+def _explicit_timestamps():
+    """Let bulk_create keep the spread-out timestamps we set instead of stamping everything now()."""
+    fields = [Document._meta.get_field('created_at'), Document._meta.get_field('updated_at'),
+              DocumentLog._meta.get_field('timestamp'), DocumentRouting._meta.get_field('forwarded_at'),
+              Notification._meta.get_field('created_at')]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def _title(rng):
+    return ' '.join(rng.sample(WORDS, 4)).capitalize()
+
+
+def _history(rng, doc, count, users, depts, now):
+    """``count`` logs and about a tenth as many routings, spread between the document's creation and now."""
+    span = (now - doc.created_at).total_seconds()
+    times = sorted(doc.created_at + timedelta(seconds=rng.random() * span) for _ in range(count))
+    logs = [DocumentLog(document=doc, user=rng.choice(users), action=rng.choice(LOG_ACTIONS),
+                        notes='' if rng.random() < 0.7 else _title(rng), timestamp=t) for t in times]
+    routings = [DocumentRouting(document=doc, from_department=rng.choice(depts), to_department=rng.choice(depts),
+                                forwarded_by=rng.choice(users), forwarded_at=t, completed=True)
+                for t in times[::10]]
+    return logs, routings
+
+
+def seed(departments=20, users_per_department=25, documents=1_000_000, logs_per_document=10,
+         notifications_per_user=200, long_histories=10, long_history_length=2000, days=730,
+         chunk_size=5000, rng_seed=42, progress=None):
+    """
+    Create the benchmark dataset and return the number of rows created
+    per model. ``progress(phase, done, total)`` is called after each chunk.
+    Raises ValueError if benchmark data is already present.
+    """
+    if Department.objects.filter(code__startswith=CODE_PREFIX).exists():
+        raise ValueError('Benchmark data already exists; seed a fresh database.')
+    progress = progress or (lambda phase, done, total: None)
+    rng = random.Random(rng_seed)
+    now = timezone.now()
+    created = dict.fromkeys(('departments', 'users', 'documents', 'logs', 'routings', 'notifications'), 0)
+
+    depts = Department.objects.bulk_create(
+        Department(name=f'Benchmark Office {i + 1}', code=f'{CODE_PREFIX}{i + 1:03d}') for i in range(departments))
+    password = make_password(PASSWORD)
+    users = [User(username=f'bench-{d.code.lower()}-{j}', password=password,
+                  role='dept_head' if j == 0 else 'dept_sender_receiver', department=d)
+             for d in depts for j in range(users_per_department)]
+    users += [User(username=f'bench-{role}-{j}', password=password, role=role, is_superuser=role == 'super_admin')
+              for role in ('super_admin', 'governor', 'executive') for j in range(2)]
+    users = User.objects.bulk_create(users)
+    created['departments'], created['users'] = len(depts), len(users)
+    staff = {}
+    for user in users:
+        if user.role == 'dept_sender_receiver':
+            staff.setdefault(user.department_id, []).append(user)
+    statuses, weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+
+    first_pk = last_pk = None
+    with _explicit_timestamps():
+        for start in range(0, documents, chunk_size):
+            with transaction.atomic():
+                docs = []
+                for reference in reserve_reference_numbers(min(chunk_size, documents - start)):
+                    origin = rng.choice(depts)
+                    current = origin if rng.random() < 0.7 else rng.choice(depts)
+                    status = rng.choices(statuses, weights)[0]
+                    created_at = now - timedelta(days=days * rng.random())
+                    docs.append(Document(
+                        title=_title(rng), reference_number=reference, source=rng.choice(('internal', 'external')),
+                        classification=rng.choice(('confidential', 'internal', 'public')), status=status,
+                        description=' '.join(rng.choices(WORDS, k=20)), created_by=rng.choice(staff[origin.pk]),
+                        assigned_to=None if status == 'draft' else rng.choice(staff[current.pk]),
+                        origin_department=origin, current_department=current, created_at=created_at,
+                        updated_at=created_at + (now - created_at) * rng.random(), logged_at=created_at,
+                    ))
+                Document.objects.bulk_create(docs)
+                first_pk = first_pk or docs[0].pk
+                last_pk = docs[-1].pk
+
+                logs, routings = [], []
+                for doc in docs:
+                    doc_logs, doc_routings = _history(rng, doc, rng.randint(1, 2 * logs_per_document - 1),
+                                                      staff[doc.current_department_id], depts, now)
+                    logs += doc_logs
+                    if doc.current_department_id != doc.origin_department_id:
+                        routings += doc_routings or [DocumentRouting(
+                            document=doc, from_department=doc.origin_department, to_department=doc.current_department,
+                            forwarded_by=doc.created_by, forwarded_at=doc.updated_at)]
+                DocumentLog.objects.bulk_create(logs, batch_size=chunk_size)
+                DocumentRouting.objects.bulk_create(routings, batch_size=chunk_size)
+            created['documents'] += len(docs)
+            created['logs'] += len(logs)
+            created['routings'] += len(routings)
+            progress('documents', created['documents'], documents)
+
+        # A few recent documents that went round every office
+        recent = Document.objects.order_by('-pk')[:long_histories] if first_pk else []
+        for doc in recent:
+            with transaction.atomic():
+                logs, routings = _history(rng, doc, long_history_length, users, depts, now)
+                DocumentLog.objects.bulk_create(logs, batch_size=chunk_size)
+                DocumentRouting.objects.bulk_create(routings, batch_size=chunk_size)
+            created['logs'] += len(logs)
+            created['routings'] += len(routings)
+        progress('long histories', long_histories, long_histories)
+
+        for done, user in enumerate(users, 1):
+            if first_pk is None:
+                break
+            Notification.objects.bulk_create((
+                Notification(recipient=user, document_id=rng.randint(first_pk, last_pk), message=_title(rng),
+                             is_read=rng.random() < 0.8, created_at=now - timedelta(days=days * rng.random()))
+                for _ in range(notifications_per_user)), batch_size=chunk_size)
+            created['notifications'] += notifications_per_user
+            if done % 50 == 0 or done == len(users):
+                progress('notifications', done, len(users))
+
+    stats.rebuild()
+    access.rebuild()
+    unread.recount(user.pk for user in users)
+    backend = search.get_backend()
+    if first_pk is not None:
+        for start in range(first_pk, last_pk + 1, chunk_size):
+            backend.index_many(list(Document.objects.filter(pk__gte=start, pk__lt=start + chunk_size)))
+            progress('search index', min(start + chunk_size - first_pk, documents), documents)
+    return created
+
+
+# ─── HARNESS ──────────────────────────────────────────────────────────────────
+# Scenarios POST real transitions, so they only ever act as seeded users on
+# seeded documents, and run() refuses a database without them.
+
+class NotSeeded(Exception):
+    pass
+
+
+def _seeded_documents(docs=None):
+    return (Document.objects if docs is None else docs).filter(origin_department__code__startswith=CODE_PREFIX)
+
+
+def _seeded_users():
+    return User.objects.filter(username__startswith='bench-')
+
+
+class VirtualUser:
+    """One seeded user with a logged-in client and the documents its scenarios work on."""
+
+    def __init__(self, user, rng, pool_size, host):
+        self.user = user
+        self.rng = rng
+        self.client = Client(raise_request_exception=False, HTTP_HOST=host)
+        if user is not None:
+            self.client.force_login(user)
+            self.docs = self._sample(_seeded_documents(Document.objects.visible_to(user)), 200)
+            mine = _seeded_documents()
+            if user.department_id:
+                mine = mine.filter(current_department=user.department_id)
+            self.pools = {
+                'route': self._sample(mine.filter(status='esigned'), pool_size),
+                'notify': self._sample(mine.filter(status__in=('released', 'returned')), pool_size),
+            }
+
+    def _sample(self, docs, size):
+        bounds = Document.objects.order_by('pk').values_list('pk', flat=True)
+        low, high = bounds.first() or 0, bounds.last() or 0
+        pivot = self.rng.randint(low, high) if high else 0
+        ids = list(docs.filter(pk__gte=pivot).order_by('pk').values_list('pk', flat=True)[:size])
+        if len(ids) < size:
+            ids += list(docs.filter(pk__lt=pivot).order_by('pk').values_list('pk', flat=True)[:size - len(ids)])
+        return ids
+
+    def doc(self):
+        return self.rng.choice(self.docs) if self.docs else 0
+
+    def take(self, pool):
+        return self.pools[pool].pop() if self.pools[pool] else None
+
+
+class Scenario:
+    """
+    ``request(vu)`` returns ``(method, path, data)`` for the next request,
+    or None once the virtual user has nothing left to do (e.g. no more
+    documents to route).
+    """
+
+    def __init__(self, name, url_name, role, request):
+        self.name = name
+        self.url_name = url_name
+        self.role = role
+        self.request = request
+
+
+def _get(url_name, *args, query=''):
+    def request(vu):
+        resolved = [arg(vu) if callable(arg) else arg for arg in args]
+        return 'GET', reverse(url_name, args=resolved) + query, None
+    return request
+
+
+def _doc(vu):
+    return vu.doc()
+
+
+def _long_history(vu):
+    return vu.rng.choice(LONG_HISTORY_IDS) if LONG_HISTORY_IDS else vu.doc()
+
+
+def _route(vu):
+    pk = vu.take('route')
+    if pk is None:
+        return None
+    to = vu.rng.choice(DEPARTMENT_IDS)
+    return 'POST', reverse('document_route_decision', args=[pk]), {'action': 'route', 'to_department': to}
+
+
+def _notify(vu):
+    pk = vu.take('notify')
+    if pk is None:
+        return None
+    return 'POST', reverse('document_notify', args=[pk]), {'notes': 'Benchmark'}
+
+
+def _process(vu):
+    return 'POST', reverse('document_process', args=[vu.doc()]), {'notes': 'Benchmark'}
+
+
+def _bulk_classify(vu):
+    ids = vu.rng.sample(vu.docs, min(20, len(vu.docs)))
+    return 'POST', reverse('document_bulk_action'), {'action': 'classify', 'classification': 'internal',
+                                                     'ids': ids}
+
+
+def _assign_role(vu):
+    return 'GET', reverse('assign_role', args=[vu.rng.choice(USER_IDS)]), None
+
+
+SEARCH = '?query=budget'
+SCENARIOS = [
+    Scenario('index', 'index', 'dept_sender_receiver', _get('index')),
+    Scenario('login', 'login', None, _get('login')),
+    Scenario('register', 'register', None, _get('register')),
+    Scenario('dashboard [sender]', 'dashboard', 'dept_sender_receiver', _get('dashboard')),
+    Scenario('dashboard [head]', 'dashboard', 'dept_head', _get('dashboard')),
+    Scenario('dashboard [governor]', 'dashboard', 'governor', _get('dashboard')),
+    Scenario('dashboard [admin]', 'dashboard', 'super_admin', _get('dashboard')),
+    Scenario('document_list [sender]', 'document_list', 'dept_sender_receiver', _get('document_list')),
+    Scenario('document_list [head]', 'document_list', 'dept_head', _get('document_list')),
+    Scenario('document_list [governor]', 'document_list', 'governor', _get('document_list')),
+    Scenario('document_list search', 'document_list', 'dept_head', _get('document_list', query=SEARCH)),
+    Scenario('document_list by status', 'document_list', 'dept_head',
+             _get('document_list', query='?status=pending_review')),
+    Scenario('document_create', 'document_create', 'dept_sender_receiver', _get('document_create')),
+    Scenario('document_import', 'document_import', 'dept_sender_receiver', _get('document_import')),
+    Scenario('document_export', 'document_export', 'dept_head',
+             _get('document_export', 'registry', query=SEARCH + '&format=csv')),
+    Scenario('document_bulk_action', 'document_bulk_action', 'dept_head', _bulk_classify),
+    Scenario('document_detail [sender]', 'document_detail', 'dept_sender_receiver', _get('document_detail', _doc)),
+    Scenario('document_detail [head]', 'document_detail', 'dept_head', _get('document_detail', _doc)),
+    Scenario('document_detail long history', 'document_detail', 'super_admin',
+             _get('document_detail', _long_history)),
+    Scenario('document_timeline long history', 'document_timeline', 'super_admin',
+             _get('document_timeline', _long_history)),
+    Scenario('document_file', 'document_file', 'dept_head', _get('document_file', _doc)),
+    Scenario('document_esignature', 'document_esignature', 'dept_head', _get('document_esignature', _doc)),
+    Scenario('document_derivative', 'document_derivative', 'dept_head',
+             _get('document_derivative', _doc, 'thumbnail')),
+    Scenario('document_classify', 'document_classify', 'dept_head', _get('document_classify', _doc)),
+    Scenario('document_assign', 'document_assign', 'dept_head', _get('document_assign', _doc)),
+    Scenario('document_process', 'document_process', 'dept_sender_receiver', _get('document_process', _doc)),
+    Scenario('document_process POST', 'document_process', 'dept_sender_receiver', _process),
+    Scenario('document_review', 'document_review', 'dept_head', _get('document_review', _doc)),
+    Scenario('document_esign', 'document_esign', 'dept_head', _get('document_esign', _doc)),
+    Scenario('document_route_decision', 'document_route_decision', 'dept_head',
+             _get('document_route_decision', _doc)),
+    Scenario('document_route_decision POST', 'document_route_decision', 'dept_head', _route),
+    Scenario('document_notify', 'document_notify', 'dept_head', _get('document_notify', _doc)),
+    Scenario('document_notify POST', 'document_notify', 'dept_head', _notify),
+    Scenario('manage_users', 'manage_users', 'super_admin', _get('manage_users')),
+    Scenario('assign_role', 'assign_role', 'super_admin', _assign_role),
+    Scenario('manage_departments', 'manage_departments', 'super_admin', _get('manage_departments')),
+    Scenario('notifications', 'notifications', 'dept_sender_receiver', _get('notifications')),
+    Scenario('notifications_count', 'notifications_count', 'dept_sender_receiver', _get('notifications_count')),
+    Scenario('api_documents', 'api_documents', 'dept_head', _get('api_documents')),
+    Scenario('api_documents search', 'api_documents', 'dept_head', _get('api_documents', query=SEARCH)),
+    Scenario('api_document', 'api_document', 'dept_sender_receiver', _get('api_document', _doc)),
+    Scenario('api_document_logs', 'api_document_logs', 'dept_head', _get('api_document_logs', _doc)),
+    Scenario('api_document_routings', 'api_document_routings', 'dept_head', _get('api_document_routings', _doc)),
+    Scenario('api_document_timeline', 'api_document_timeline', 'super_admin',
+             _get('api_document_timeline', _long_history)),
+    Scenario('api_notifications', 'api_notifications', 'dept_sender_receiver', _get('api_notifications')),
+    Scenario('metrics', 'metrics', 'super_admin', _get('metrics')),
+]
+# Routes not driven, and why
+SKIPPED = {
+    'logout': "ends the virtual user's session",
+    'notifications_stream': 'long-lived event stream, not a request/response',
+}
+
+# Filled in by run() from the seeded data
+LONG_HISTORY_IDS, DEPARTMENT_IDS, USER_IDS = [], [], []
+
+
+def uncovered():
+    """Names of dms.urls routes that no scenario drives and that are not knowingly skipped."""
+    from .urls import urlpatterns
+
+    covered = {s.url_name for s in SCENARIOS} | set(SKIPPED)
+    return [p.name for p in urlpatterns if p.name not in covered]
+
+
+def peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # bytes on macOS, KiB on Linux
+
+
+def _percentiles(values):
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return {'mean': value, 'p50': value, 'p90': value, 'p95': value, 'p99': value, 'max': value}
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {'mean': statistics.fmean(values), 'p50': cuts[49], 'p90': cuts[89], 'p95': cuts[94],
+            'p99': cuts[98], 'max': max(values)}
+
+
+def _send(vu, method, path, data):
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        if method == 'POST':
+            response = vu.client.post(path, data)
+        else:
+            response = vu.client.get(path)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        response.close()
+        elapsed = time.perf_counter() - started
+    return elapsed * 1000, len(queries), response.status_code
+
+
+def _drive(scenario, vu, warmup, requests, samples, lock):
+    try:
+        for i in range(warmup + requests):
+            request = scenario.request(vu)
+            if request is None:
+                break
+            sample = _send(vu, *request)
+            if i >= warmup:
+                with lock:
+                    samples.append(sample)
+    finally:
+        connection.close()
+
+
+def run_scenario(scenario, vus, warmup, requests):
+    samples, lock = [], threading.Lock()
+    threads = [threading.Thread(target=_drive, args=(scenario, vu, warmup, requests, samples, lock))
+               for vu in vus]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    latencies = [ms for ms, _, _ in samples]
+    queries = [n for _, n, _ in samples]
+    statuses = {}
+    for _, _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'requests': len(samples),
+        'errors': sum(n for status, n in statuses.items() if int(status) >= 500),
+        'statuses': statuses,
+        'throughput_rps': round(len(samples) / wall, 1) if wall else 0.0,
+        'latency_ms': {k: round(v, 2) for k, v in _percentiles(latencies).items()},
+        'queries': {'median': statistics.median(queries) if queries else 0, 'max': max(queries, default=0)},
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def _virtual_users(role, count, rng, pool_size, host):
+    if role is None:
+        return [VirtualUser(None, rng, pool_size, host) for _ in range(count)]
+    candidates = list(_seeded_users().filter(role=role).order_by('pk'))
+    if not candidates:
+        return []
+    chosen = rng.sample(candidates, count) if len(candidates) >= count else rng.choices(candidates, k=count)
+    return [VirtualUser(user, rng, pool_size, host) for user in chosen]
+
+
+def run(names=None, users=8, requests=50, warmup=2, host='localhost', rng_seed=1, progress=None):
+    """
+    Drive each scenario (all, or those whose name starts with one of
+    ``names``) with ``users`` concurrent virtual users making ``requests``
+    requests each, after ``warmup`` unrecorded ones. Returns the report
+    that baselines are made of.
+    """
+    if not Department.objects.filter(code__startswith=CODE_PREFIX).exists():
+        raise NotSeeded('No benchmark data in this database; run seed_benchmark_data against a scratch database.')
+    rng = random.Random(rng_seed)
+    LONG_HISTORY_IDS[:] = list(_seeded_documents().order_by('-pk').values_list('pk', flat=True)[:10])
+    DEPARTMENT_IDS[:] = list(Department.objects.filter(code__startswith=CODE_PREFIX).values_list('pk', flat=True))
+    USER_IDS[:] = list(_seeded_users().order_by('pk').values_list('pk', flat=True)[:500])
+    selected = [s for s in SCENARIOS if not names or s.name.startswith(tuple(names))]
+
+    report = {
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'dataset': {model.__name__: model.objects.count()
+                    for model in (Department, User, Document, DocumentLog, DocumentRouting, Notification)},
+        'settings': {'users': users, 'requests': requests, 'warmup': warmup},
+        'scenarios': {},
+    }
+    for scenario in selected:
+        vus = _virtual_users(scenario.role, users, rng, warmup + requests, host)
+        if not vus:
+            continue
+        result = run_scenario(scenario, vus, warmup, requests)
+        report['scenarios'][scenario.name] = result
+        if progress:
+            progress(scenario.name, result)
+    report['peak_rss_kb'] = peak_rss_kb()
+    return report
+
+
+def compare(baseline, current, tolerance=0.25):
+    """
+    ``(scenario, metric, old, new, regressed)`` rows for the scenarios in
+    both reports. p95 latency regresses when it grows by more than
+    ``tolerance`` (a fraction); the median query count by any amount;
+    errors whenever there are new ones.
+    """
+    rows = []
+    for name, new in current['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name)
+        if old is None:
+            continue
+        old_p95, new_p95 = old['latency_ms']['p95'], new['latency_ms']['p95']
+        rows.append((name, 'p95 ms', old_p95, new_p95, new_p95 > old_p95 * (1 + tolerance)))
+        old_q, new_q = old['queries']['median'], new['queries']['median']
+        rows.append((name, 'queries', old_q, new_q, new_q > old_q))
+        rows.append((name, 'errors', old['errors'], new['errors'], new['errors'] > old['errors']))
+    return rows
@@ -0,0 +1,19 @@
+# checks.py
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+from . import pagecache
+
+
+@register(Tags.caches)
+def check_page_cache(app_configs, **kwargs):
+    """Page caching on a per-process cache serves stale pages from every worker but the writer."""
+    if not getattr(settings, 'DMS_PAGE_CACHE_TIMEOUT', pagecache.DEFAULT_TIMEOUT) or pagecache.shared():
+        return []
+    level = Warning if settings.DEBUG else Error
+    return [level(
+        'DMS_PAGE_CACHE_TIMEOUT is set but the default cache is local to each process, so invalidations '
+        'only reach the process that wrote.',
+        hint='Use a shared cache backend (Redis, Memcached, FileBasedCache) or set DMS_PAGE_CACHE_TIMEOUT = 0.',
+        id='dms.E001' if level is Error else 'dms.W001',
+    )]
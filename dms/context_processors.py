@@ -0,0 +1,5 @@
+from django.conf import settings
+
+
+def notifications(request):
+    return {'notification_stream_enabled': getattr(settings, 'DMS_NOTIFICATION_STREAM', False)}
@@ -0,0 +1,135 @@
+# delivery.py
+"""
+Sending stored files to the browser once a view has checked access.
+
+By default the file goes out as a FileResponse, which WSGI servers such as
+gunicorn hand to os.sendfile(). With DMS_SENDFILE_BACKEND set to 'nginx'
+(X-Accel-Redirect) or 'apache' (X-Sendfile) the front proxy does the
+transfer and the worker is freed immediately. Single byte ranges and
+conditional requests (ETag / Last-Modified) are handled here in all
+modes; the proxies handle ranges themselves.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """Read-only view of ``length`` bytes of an open file, starting at ``start``."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single satisfiable range, None to ignore it, or False if unsatisfiable."""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # Multiple or malformed ranges: serve the whole file
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _etag(name, stat):
+    # Blob names are content hashes; anything else falls back to size and mtime
+    base = os.path.basename(name)
+    if re.fullmatch(r'[0-9a-f]{64}', base):
+        return quote_etag(base)
+    return quote_etag(f'{stat.st_size:x}-{int(stat.st_mtime):x}')
+
+
+def _content_disposition(filename, as_attachment):
+    # Control characters (CR/LF above all) can't go in a header, escaped or not
+    filename = re.sub(r'[\x00-\x1f\x7f]', '', filename)
+    return content_disposition_header(as_attachment, filename)
+
+
+def serve_file(request, storage, name, filename=None, as_attachment=True):
+    """Respond with file ``name`` from ``storage``; the caller has already checked access."""
+    path = storage.path(name)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404('File not found.')
+    filename = filename or os.path.basename(name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    etag = _etag(name, stat)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        if isinstance(not_modified, HttpResponseNotModified):
+            not_modified['ETag'] = etag
+        return not_modified
+
+    backend = getattr(settings, 'DMS_SENDFILE_BACKEND', None)
+    if backend in ('nginx', 'apache'):
+        response = HttpResponse(content_type=content_type)
+        if backend == 'nginx':
+            response['X-Accel-Redirect'] = settings.DMS_SENDFILE_URL.rstrip('/') + '/' + quote(name)
+        else:
+            response['X-Sendfile'] = path
+    else:
+        response = _file_response(request, path, stat.st_size, etag, content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = _content_disposition(filename, as_attachment)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _file_response(request, path, size, etag, content_type):
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header and request.method in ('GET', 'HEAD'):
+        if_range = request.headers.get('If-Range')
+        if not if_range or if_range == etag:
+            byte_range = parse_range(range_header, size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    f = open(path, 'rb')
+    if byte_range is None:
+        return FileResponse(f, content_type=content_type)
+    start, end = byte_range
+    response = FileResponse(RangeFile(f, start, end - start + 1), status=206, content_type=content_type)
+    response['Content-Length'] = str(end - start + 1)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
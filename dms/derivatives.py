@@ -0,0 +1,101 @@
+# derivatives.py
+"""
+Previews, thumbnails and normalised signatures for uploaded files.
+
+Once a document's upload commits, build() hands the Pillow work to a
+process pool (dms.imaging) from a background thread and records the
+results as Derivative rows. Renditions belong to the blob, not the
+document, so identical uploads share them and a blob that already has
+its renditions is never rendered again.
+"""
+import os
+from concurrent.futures import as_completed
+
+from django.conf import settings
+from django.db import transaction
+
+from . import imaging
+from .models import Blob, Derivative
+from .storage import blob_storage, derivative_dir
+from .workers import background, process_pool
+
+KINDS = {
+    'file': ('preview', 'thumbnail'),
+    'esignature': ('signature',),
+}
+
+
+def _pool():
+    return process_pool('derivatives', settings.DMS_DERIVATIVE_WORKERS)
+
+
+def _digest(name):
+    return os.path.basename(name)
+
+
+def missing(field, name):
+    """True if blob ``name`` has no renditions yet for ``field``."""
+    digest = _digest(name)
+    return Derivative.objects.filter(blob_id=digest, kind__in=KINDS[field]).count() < len(KINDS[field])
+
+
+def _args(field, name):
+    return (field, blob_storage.path(name), blob_storage.path(derivative_dir(_digest(name))),
+            getattr(settings, 'DMS_PDFTOPPM', None))
+
+
+def _record(name, results):
+    digest = _digest(name)
+    if not results or not Blob.objects.filter(sha256=digest).exists():
+        return []
+    rows = [Derivative(blob_id=digest, kind=kind, name=f'{derivative_dir(digest)}/{filename}',
+                       width=width, height=height, size=size)
+            for kind, filename, width, height, size in results]
+    return Derivative.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def render(field, name):
+    """Render ``field``'s derivatives for blob ``name`` and record them; runs in the caller's thread."""
+    if getattr(settings, 'DMS_DERIVATIVE_WORKERS', 0):
+        results = _pool().submit(imaging.render, *_args(field, name)).result()
+    else:
+        results = imaging.render(*_args(field, name))
+    return _record(name, results)
+
+
+def render_many(items):
+    """Render every ``(field, name)`` pair across the whole pool; returns how many derivatives were recorded."""
+    if not getattr(settings, 'DMS_DERIVATIVE_WORKERS', 0):
+        return sum(len(render(field, name)) for field, name in items)
+    pool = _pool()
+    futures = {pool.submit(imaging.render, *_args(field, name)): name for field, name in items}
+    return sum(len(_record(futures[f], f.result())) for f in as_completed(futures))
+
+
+def _render_missing(field, name):
+    if missing(field, name):
+        render(field, name)
+
+
+def build(field, name):
+    """Queue derivatives for ``field`` = blob ``name`` once the current transaction commits."""
+    if name and name.startswith('blobs/') and field in KINDS:
+        workers = max(getattr(settings, 'DMS_DERIVATIVE_WORKERS', 0), 1)
+        transaction.on_commit(lambda: background(_render_missing, field, name, pool='derivatives', workers=workers))
+
+
+def for_document(doc):
+    """{kind: Derivative} for the document's attachment and signature, in one query."""
+    digests = [_digest(f.name) for f in (doc.file, doc.esignature) if f]
+    if not digests:
+        return {}
+    by_blob = {}
+    for d in Derivative.objects.filter(blob_id__in=digests):
+        by_blob[d.blob_id, d.kind] = d
+    found = {}
+    for field, kinds in KINDS.items():
+        f = getattr(doc, field)
+        for kind in kinds:
+            if f and (_digest(f.name), kind) in by_blob:
+                found[kind] = by_blob[_digest(f.name), kind]
+    return found
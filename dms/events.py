@@ -0,0 +1,54 @@
+# events.py
+"""
+In-process pub/sub for notification events.
+
+notify_users() publishes here after its rows are committed; each open
+Server-Sent Events stream (dms.views.notifications_stream) holds an
+asyncio queue subscribed to its user. Publishing is thread-safe, since
+sync views run in worker threads under ASGI. Streams in other processes
+don't see these events and pick changes up on their periodic resync.
+"""
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_subscribers = defaultdict(set)
+
+
+def subscribe(user_id, loop, queue):
+    with _lock:
+        _subscribers[user_id].add((loop, queue))
+
+
+def unsubscribe(user_id, loop, queue):
+    with _lock:
+        subs = _subscribers.get(user_id)
+        if subs:
+            subs.discard((loop, queue))
+            if not subs:
+                del _subscribers[user_id]
+
+
+def has_subscribers():
+    return bool(_subscribers)
+
+
+def publish(user_id, event):
+    with _lock:
+        targets = list(_subscribers.get(user_id, ()))
+    for loop, queue in targets:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+        except RuntimeError:
+            # Loop already closed; its stream is going away
+            pass
+
+
+def publish_notifications(notifications):
+    for n in notifications:
+        publish(n.recipient_id, {
+            'id': n.pk,
+            'message': n.message,
+            'document': n.document_id,
+            'created_at': n.created_at.isoformat() if n.created_at else None,
+        })
@@ -0,0 +1,233 @@
+# export.py
+"""
+Streaming CSV / XLSX exports of the document registry and audit trail.
+
+Rows come from values_list() projections read with iterator(chunk_size),
+so the database hands them over in batches and nothing holds the whole
+result. The writers are generators that emit bytes every few hundred
+rows; StreamingHttpResponse (or the export_documents command) passes
+them on as they come. XLSX needs no extra package: the workbook is a ZIP
+streamed through zipfile, with one inline-string worksheet.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from .logarchive import read_entry
+from .models import Document, DocumentLog, LogArchiveEntry, User
+
+CHUNK_SIZE = 2000
+FLUSH_EVERY = 500
+# Excel's row limit, less the header; CSV exports are not capped
+XLSX_MAX_ROWS = 1_048_575
+# Text-search exports take at most this many best matches
+SEARCH_LIMIT = 10_000
+
+REGISTRY_COLUMNS = [
+    ('Reference', 'reference_number', None),
+    ('Title', 'title', None),
+    ('Source', 'source', dict(Document.SOURCE_CHOICES)),
+    ('Classification', 'classification', dict(Document.CLASSIFICATION_CHOICES)),
+    ('Status', 'status', dict(Document.STATUS_CHOICES)),
+    ('Action', 'action_type', dict(Document.ACTION_TYPE_CHOICES)),
+    ('Origin Office', 'origin_department__code', None),
+    ('Current Office', 'current_department__code', None),
+    ('Created By', 'created_by__username', None),
+    ('Assigned To', 'assigned_to__username', None),
+    ('Correspondent', 'correspondent_name', None),
+    ('Agency', 'correspondent_agency', None),
+    ('Created', 'created_at', None),
+    ('Updated', 'updated_at', None),
+    ('Logged', 'logged_at', None),
+]
+AUDIT_COLUMNS = [
+    ('Reference', 'document__reference_number', None),
+    ('Timestamp', 'timestamp', None),
+    ('Action', 'action', dict(DocumentLog.ACTION_CHOICES)),
+    ('User', 'user__username', None),
+    ('Notes', 'notes', None),
+]
+
+
+def _formatter(columns):
+    labels = [choices for _, _, choices in columns]
+
+    def format_row(row):
+        values = []
+        for value, choices in zip(row, labels):
+            if value is None:
+                value = ''
+            elif isinstance(value, datetime):
+                value = timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+            elif choices:
+                value = choices.get(value, value)
+            values.append(value)
+        return values
+    return format_row
+
+
+def registry(docs):
+    """(header, rows) for the documents in ``docs``, oldest first."""
+    rows = (docs.order_by('created_at', 'id')
+            .values_list(*[path for _, path, _ in REGISTRY_COLUMNS])
+            .iterator(chunk_size=CHUNK_SIZE))
+    return [header for header, _, _ in REGISTRY_COLUMNS], map(_formatter(REGISTRY_COLUMNS), rows)
+
+
+def _audit_rows(docs):
+    ids = docs.values('pk')
+    yield from (DocumentLog.objects.filter(document__in=ids)
+                .order_by('document_id', 'timestamp', 'id')
+                .values_list(*[path for _, path, _ in AUDIT_COLUMNS])
+                .iterator(chunk_size=CHUNK_SIZE))
+    # Logs of long-closed documents live in the archive segments (see dms.logarchive)
+    entries = (LogArchiveEntry.objects.filter(document__in=ids).select_related('document')
+               .only('segment', 'offset', 'length', 'document__reference_number')
+               .order_by('document_id', 'pk').iterator(chunk_size=200))
+    usernames = {}
+    for entry in entries:
+        logs = read_entry(entry)
+        # Blocks written before usernames were archived only carry the display name
+        missing = {log.user_id for log in logs if log.user_id and not log.username} - usernames.keys()
+        if missing:
+            usernames.update(dict.fromkeys(missing))
+            usernames.update(User.objects.filter(pk__in=missing).values_list('pk', 'username'))
+        for log in logs:
+            username = log.username or usernames.get(log.user_id)
+            # Same column as live rows; a deleted account keeps its archived display name
+            yield entry.document.reference_number, log.timestamp, log.action, username or log.user, log.notes
+
+
+def audit_trail(docs):
+    """(header, rows) for every log entry of the documents in ``docs``, archived ones included."""
+    return [header for header, _, _ in AUDIT_COLUMNS], map(_formatter(AUDIT_COLUMNS), _audit_rows(docs))
+
+
+# ─── WRITERS ──────────────────────────────────────────────────────────────────
+
+FORMULA_START = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_safe(value):
+    # Keep spreadsheet apps from running cell text as a formula
+    if isinstance(value, str) and value.startswith(FORMULA_START):
+        return "'" + value
+    return value
+
+
+def stream_csv(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')  # lets Excel detect UTF-8
+    writer.writerow(header)
+    yield buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_csv_safe(value) for value in row])
+        if count % FLUSH_EVERY == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+class _Sink:
+    """Write-only file for zipfile that hands out what has been written so far."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+SHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+DOC_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        XML_DECL + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        XML_DECL + f'<Relationships xmlns="{REL_NS}">'
+        f'<Relationship Id="rId1" Type="{DOC_REL}/officeDocument" Target="xl/workbook.xml"/></Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        XML_DECL + f'<Relationships xmlns="{REL_NS}">'
+        f'<Relationship Id="rId1" Type="{DOC_REL}/worksheet" Target="worksheets/sheet1.xml"/></Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values):
+    cells = ''.join(
+        f'<c t="inlineStr"><is><t xml:space="preserve">{escape(ILLEGAL_XML.sub("", str(v)))}</t></is></c>'
+        for v in values
+    )
+    return f'<row>{cells}</row>'.encode()
+
+
+def stream_xlsx(header, rows, sheet_name='Export'):
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        workbook.writestr('xl/workbook.xml', (
+            XML_DECL + f'<workbook xmlns="{SHEET_NS}" xmlns:r="{DOC_REL}"><sheets>'
+            f'<sheet name="{escape(sheet_name)}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        yield sink.drain()
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(f'{XML_DECL}<worksheet xmlns="{SHEET_NS}"><sheetData>'.encode())
+            sheet.write(_xlsx_row(header))
+            for count, row in enumerate(islice(rows, XLSX_MAX_ROWS), 1):
+                sheet.write(_xlsx_row(row))
+                if count % FLUSH_EVERY == 0:
+                    yield sink.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+
+FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (stream_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+EXPORTS = {
+    'registry': registry,
+    'audit': audit_trail,
+}
+
+
+def export(kind, fmt, docs):
+    """(byte chunk generator, content type) for export ``kind`` of ``docs`` in format ``fmt``."""
+    writer, content_type = FORMATS[fmt]
+    header, rows = EXPORTS[kind](docs)
+    if fmt == 'xlsx':
+        return writer(header, rows, sheet_name=kind.title()), content_type
+    return writer(header, rows), content_type
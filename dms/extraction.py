@@ -0,0 +1,109 @@
+# extraction.py
+"""
+Background text extraction from uploaded documents, for search.
+
+When a document's attachment commits, queue() makes sure the blob has a
+TextExtraction row and, if it is still pending, has a background thread
+run dms.textextract on a bounded process pool (DMS_EXTRACTION_WORKERS).
+The text is stored on the row and every document using the blob is
+re-indexed. Text belongs to the blob, so re-uploads of the same bytes are
+never extracted twice. A worker claims a row by moving it from 'pending'
+to 'running' with a conditional UPDATE, so concurrent workers never run
+the same blob. Pending rows left by a restart, and running ones older
+than CLAIM_TIMEOUT, are picked up by the extract_document_text command,
+which also backfills the archive.
+"""
+import os
+from collections import Counter
+from concurrent.futures import as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import search, textextract
+from .models import Document, TextExtraction
+from .storage import blob_name, blob_storage
+from .workers import background, process_pool
+
+# A claim older than this is taken to belong to a worker that died (pdftotext alone times out at 300s)
+CLAIM_TIMEOUT = timedelta(hours=1)
+
+
+def _workers():
+    return getattr(settings, 'DMS_EXTRACTION_WORKERS', 0)
+
+
+def _args(digest):
+    return (blob_storage.path(blob_name(digest)), getattr(settings, 'DMS_PDFTOTEXT', 'pdftotext'),
+            getattr(settings, 'DMS_EXTRACT_MAX_CHARS', None))
+
+
+def _submit(digest):
+    return process_pool('extraction', _workers()).submit(textextract.extract, *_args(digest))
+
+
+def _start(digest):
+    """Move the pending job for ``digest`` to running; True if this caller got it."""
+    return TextExtraction.objects.filter(blob_id=digest, status='pending').update(
+        status='running', started_at=timezone.now()) == 1
+
+
+def _claim(digest):
+    """Create the job row if needed and claim it; True if the blob is ours to extract."""
+    TextExtraction.objects.bulk_create([TextExtraction(blob_id=digest)], ignore_conflicts=True)
+    return _start(digest)
+
+
+def _finish(digest, result):
+    status, text, error = result
+    TextExtraction.objects.filter(blob_id=digest).update(
+        status=status, text=text, error=error, attempts=F('attempts') + 1, finished_at=timezone.now())
+    if status == 'done':
+        search.get_backend().index_many(list(Document.objects.filter(file=blob_name(digest))))
+    return status
+
+
+def extract(digest):
+    """Extract claimed blob ``digest`` now, in the caller's thread (through the pool if one is configured)."""
+    if _workers():
+        result = _submit(digest).result()
+    else:
+        result = textextract.extract(*_args(digest))
+    return _finish(digest, result)
+
+
+def _extract_if_pending(digest):
+    if _claim(digest):
+        extract(digest)
+
+
+def queue(name):
+    """Extract the text of blob ``name`` in the background once the current transaction commits."""
+    if name and name.startswith('blobs/'):
+        digest = os.path.basename(name)
+        workers = max(_workers(), 1)
+        transaction.on_commit(lambda: background(_extract_if_pending, digest, pool='extraction', workers=workers))
+
+
+def run_pending(retry_failed=False):
+    """
+    Create jobs for every attachment without one, then work through all
+    pending jobs across the whole pool. Returns a Counter of outcomes.
+    """
+    names = Document.objects.filter(file__startswith='blobs/').values_list('file', flat=True).distinct().iterator()
+    TextExtraction.objects.bulk_create((TextExtraction(blob_id=os.path.basename(n)) for n in names),
+                                       ignore_conflicts=True, batch_size=500)
+    TextExtraction.objects.filter(status='running', started_at__lt=timezone.now() - CLAIM_TIMEOUT).update(
+        status='pending')
+    if retry_failed:
+        TextExtraction.objects.filter(status='failed').update(status='pending')
+    pending = TextExtraction.objects.filter(status='pending').values_list('blob_id', flat=True)
+    # Upload hooks or another run may claim some of these first; those are theirs
+    digests = [digest for digest in pending if _start(digest)]
+    if not _workers():
+        return Counter(extract(digest) for digest in digests)
+    futures = {_submit(digest): digest for digest in digests}
+    return Counter(_finish(futures[f], f.result()) for f in as_completed(futures))
@@ -1,3 +1,5 @@
+import zipfile
+
 from django import forms
 from .models import User, Document, Department, DocumentRouting
 
@@ -54,6 +56,18 @@ class DocumentCreateForm(forms.ModelForm):
         }
 
 
+class DocumentImportForm(forms.Form):
+    manifest = forms.FileField(widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv,.jsonl,.ndjson'}))
+    attachments = forms.FileField(required=False,
+                                  widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.zip'}))
+
+    def clean_attachments(self):
+        attachments = self.cleaned_data.get('attachments')
+        if attachments and not zipfile.is_zipfile(attachments):
+            raise forms.ValidationError('Attachments must be a ZIP archive.')
+        return attachments
+
+
 class DocumentClassifyForm(forms.ModelForm):
     class Meta:
         model = Document
@@ -96,3 +110,35 @@ class DocumentSearchForm(forms.Form):
                                widget=forms.Select(attrs={'class': 'form-select'}))
     source = forms.ChoiceField(required=False, choices=[('', 'All Sources')] + Document.SOURCE_CHOICES,
                                widget=forms.Select(attrs={'class': 'form-select'}))
+
+
+class DocumentBulkActionForm(forms.Form):
+    ACTION_CHOICES = [
+        ('classify', 'Classify'),
+        ('assign', 'Assign Action Officer'),
+        ('route', 'Route to Office'),
+        ('notify', 'Notify & Archive'),
+    ]
+    action = forms.ChoiceField(choices=ACTION_CHOICES, widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+    classification = forms.ChoiceField(required=False, choices=[('', 'Classification...')] + Document.CLASSIFICATION_CHOICES,
+                                       widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+    assigned_to = forms.ModelChoiceField(required=False, queryset=User.objects.none(), empty_label='Action officer...',
+                                         widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+    to_department = forms.ModelChoiceField(required=False, queryset=Department.objects.all(), empty_label='Office...',
+                                           widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+    notes = forms.CharField(required=False, widget=forms.TextInput(attrs={'class': 'form-control form-control-sm', 'placeholder': 'Notes'}))
+
+    REQUIRED = {'classify': 'classification', 'assign': 'assigned_to', 'route': 'to_department'}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['assigned_to'].queryset = User.objects.filter(
+            role__in=['dept_sender_receiver', 'executive']
+        )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        needed = self.REQUIRED.get(cleaned_data.get('action'))
+        if needed and not cleaned_data.get(needed):
+            self.add_error(needed, 'Required for this action.')
+        return cleaned_data
@@ -0,0 +1,108 @@
+# imaging.py
+"""
+Pillow work for dms.derivatives, run in worker processes.
+
+Nothing here touches Django: the functions take file paths and return
+plain tuples so they can be pickled to and from a process pool.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+
+from PIL import Image, ImageOps
+
+PREVIEW_SIZE = (1280, 1280)
+THUMBNAIL_SIZE = (320, 320)
+SIGNATURE_SIZE = (600, 200)
+
+
+def _save(image, path, format, **options):
+    partial = f'{path}.{os.getpid()}.part'
+    image.save(partial, format, **options)
+    os.replace(partial, path)
+    return os.path.getsize(path)
+
+
+def _open_page(src, pdftoppm=None):
+    """The image itself, or the first page of a PDF rasterised by pdftoppm (None if neither works)."""
+    with open(src, 'rb') as f:
+        is_pdf = f.read(5) == b'%PDF-'
+    if not is_pdf:
+        try:
+            image = Image.open(src)
+            image.load()
+        except (OSError, Image.DecompressionBombError):
+            return None
+        return ImageOps.exif_transpose(image)
+    if not pdftoppm or not shutil.which(pdftoppm):
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, 'page')
+        size = str(max(PREVIEW_SIZE))
+        result = subprocess.run([pdftoppm, '-f', '1', '-l', '1', '-singlefile', '-png', '-scale-to', size, src, out],
+                                capture_output=True, timeout=60)
+        if result.returncode != 0:
+            return None
+        image = Image.open(out + '.png')
+        image.load()
+        return image
+
+
+def _flatten(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_document(src, out_dir, pdftoppm=None):
+    """Preview and thumbnail JPEGs for an uploaded document: [(kind, filename, width, height, size)]."""
+    page = _open_page(src, pdftoppm)
+    if page is None:
+        return []
+    os.makedirs(out_dir, exist_ok=True)
+    page = _flatten(page)
+    results = []
+    for kind, box in (('preview', PREVIEW_SIZE), ('thumbnail', THUMBNAIL_SIZE)):
+        page.thumbnail(box, Image.LANCZOS)
+        filename = f'{kind}.jpg'
+        size = _save(page, os.path.join(out_dir, filename), 'JPEG', quality=82, optimize=True, progressive=True)
+        results.append((kind, filename, page.width, page.height, size))
+    return results
+
+
+def render_signature(src, out_dir, pdftoppm=None):
+    """
+    A normalised signature: upright, cropped to the ink, scaled to fit
+    SIGNATURE_SIZE and saved as PNG with a transparent background.
+    """
+    image = _open_page(src, pdftoppm)
+    if image is None:
+        return []
+    os.makedirs(out_dir, exist_ok=True)
+    rgb = _flatten(image)
+    ink = ImageOps.invert(rgb.convert('L'))
+    # Treat near-white scanner noise as paper when cropping
+    bbox = ink.point(lambda v: 255 if v > 24 else 0).getbbox()
+    if bbox:
+        rgb, ink = rgb.crop(bbox), ink.crop(bbox)
+    rgb.thumbnail(SIGNATURE_SIZE, Image.LANCZOS)
+    ink = ink.resize(rgb.size, Image.LANCZOS)
+    signature = rgb.convert('RGBA')
+    signature.putalpha(ink)
+    filename = 'signature.png'
+    size = _save(signature, os.path.join(out_dir, filename), 'PNG', optimize=True)
+    return [('signature', filename, signature.width, signature.height, size)]
+
+
+RENDERERS = {
+    'file': render_document,
+    'esignature': render_signature,
+}
+
+
+def render(field, src, out_dir, pdftoppm=None):
+    return RENDERERS[field](src, out_dir, pdftoppm)
@@ -0,0 +1,190 @@
+# intake.py
+"""
+Bulk intake of external documents from a CSV or JSONL manifest.
+
+The manifest is read as a stream and written in chunks. Each chunk
+reserves its reference numbers with one UPDATE and bulk-inserts its
+documents, logs and notifications. bulk_create skips the model signals,
+so the dashboard counters, the visibility table, the search index and
+the upload pipelines (derivatives, text extraction) are fed here, once
+per chunk. Memory use is bounded by the chunk size, not the manifest.
+"""
+import csv
+import io
+import json
+import os
+from pathlib import Path
+
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from . import access, derivatives, extraction, pagecache, search, stats
+from .models import Document, DocumentLog, User
+from .references import reserve_reference_numbers
+from .storage import blob_storage
+from .utils import notify_batches
+
+CHUNK_SIZE = 500
+TEXT_FIELDS = {'title': 300, 'correspondent_name': 200, 'correspondent_agency': 200, 'description': None}
+CLASSIFICATIONS = {value for value, _ in Document.CLASSIFICATION_CHOICES}
+
+
+class IntakeResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []  # (manifest line, message)
+
+    def __bool__(self):
+        return bool(self.created)
+
+
+def read_manifest(stream, name=''):
+    """Yield ``(line, row, error)`` from a binary CSV or JSONL stream (JSONL if ``name`` says so)."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if name.lower().endswith(('.jsonl', '.ndjson')):
+        for line_number, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_number, None, f'Invalid JSON: {exc}'
+                continue
+            if isinstance(row, dict):
+                yield line_number, row, None
+            else:
+                yield line_number, None, 'Expected a JSON object'
+    else:
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row, None
+
+
+def directory_files(base):
+    """Attachment opener for manifests whose ``file`` column is a path under ``base``."""
+    base = Path(base).resolve()
+
+    def open_file(name):
+        path = (base / name).resolve()
+        if not path.is_relative_to(base) or not path.is_file():
+            raise ValueError(f'Attachment not found: {name}')
+        return File(open(path, 'rb'), name=path.name)
+    return open_file
+
+
+def zip_files(archive):
+    """Attachment opener for manifests uploaded together with a ZIP of their files."""
+    def open_file(name):
+        try:
+            info = archive.getinfo(name)
+        except KeyError:
+            raise ValueError(f'Attachment not found in archive: {name}')
+        f = File(archive.open(info), name=os.path.basename(name))
+        f.size = info.file_size
+        return f
+    return open_file
+
+
+def _clean(row):
+    fields = {}
+    for field, max_length in TEXT_FIELDS.items():
+        value = (row.get(field) or '').strip()
+        if max_length and len(value) > max_length:
+            raise ValueError(f'{field} is longer than {max_length} characters')
+        fields[field] = value
+    if not fields['title']:
+        raise ValueError('title is required')
+    classification = (row.get('classification') or 'internal').strip()
+    if classification not in CLASSIFICATIONS:
+        raise ValueError(f'Unknown classification: {classification}')
+    fields['classification'] = classification
+    return fields, (row.get('file') or '').strip()
+
+
+def _store(attachment, open_file):
+    if open_file is None:
+        raise ValueError('Manifest names a file but no attachments were supplied')
+    f = open_file(attachment)
+    try:
+        return blob_storage.save(f.name, f), f.name
+    finally:
+        f.close()
+
+
+def _write_chunk(chunk, user, department, open_file, heads, result):
+    with transaction.atomic():
+        docs, uploaded = [], set()
+        for line, fields, attachment in chunk:
+            doc = Document(**fields)
+            if attachment:
+                try:
+                    doc.file, doc.file_name = _store(attachment, open_file)
+                except ValueError as exc:
+                    result.errors.append((line, str(exc)))
+                    continue
+                uploaded.add(doc.file.name)
+            docs.append(doc)
+        if not docs:
+            return
+
+        logged_at = timezone.now()
+        for doc, reference in zip(docs, reserve_reference_numbers(len(docs), department=department)):
+            doc.reference_number = reference
+            doc.source = 'external'
+            doc.status = 'pending_review'
+            doc.logged_at = logged_at
+            doc.created_by = user
+            doc.origin_department = doc.current_department = department
+        Document.objects.bulk_create(docs)
+
+        DocumentLog.objects.bulk_create(
+            DocumentLog(document=doc, user=user, action=action) for doc in docs for action in ('created', 'logged')
+        )
+        doc_keys = [stats.document_scopes(doc.status, user.pk, None, doc.origin_department_id,
+                                          doc.current_department_id) for doc in docs]
+        stats.apply_changes((set(), keys) for keys in doc_keys)
+        access.apply_changes((doc.pk, set(), keys) for doc, keys in zip(docs, doc_keys))
+        pagecache.invalidate(pagecache.document_scopes(set().union(*doc_keys)))
+        search.get_backend().index_many(docs)
+        if heads:
+            notify_batches([(heads, doc, f"New external document received: {doc.reference_number}") for doc in docs])
+        for name in uploaded:
+            derivatives.build('file', name)
+            extraction.queue(name)
+    result.created += len(docs)
+
+
+def import_manifest(rows, user, department=None, open_file=None, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Create an external, pending-review document for every valid row of
+    ``rows`` (from read_manifest), as ``user`` and in ``department``
+    (default: the user's). Bad rows are skipped and reported in
+    ``result.errors``; ``progress(result)`` is called after each chunk.
+    """
+    department = department or user.department
+    heads = []
+    if department is not None:
+        heads = list(User.objects.filter(role='dept_head', department=department).values_list('pk', flat=True))
+    result = IntakeResult()
+    chunk = []
+    for line, row, error in rows:
+        if error:
+            result.errors.append((line, error))
+            continue
+        try:
+            fields, attachment = _clean(row)
+        except ValueError as exc:
+            result.errors.append((line, str(exc)))
+            continue
+        chunk.append((line, fields, attachment))
+        if len(chunk) >= chunk_size:
+            _write_chunk(chunk, user, department, open_file, heads, result)
+            chunk = []
+            if progress:
+                progress(result)
+    if chunk:
+        _write_chunk(chunk, user, department, open_file, heads, result)
+        if progress:
+            progress(result)
+    return result
@@ -0,0 +1,130 @@
+# logarchive.py
+"""
+Cold storage for DocumentLog rows of closed documents.
+
+Each document's archived logs are written as one zlib-compressed JSON
+block appended to the current segment file in DMS_LOG_ARCHIVE_DIR;
+segments roll over at DMS_LOG_SEGMENT_SIZE and are never rewritten.
+LogArchiveEntry records (segment, offset, length) per block, so reading a
+document's history back is an index lookup plus a slice of a
+memory-mapped segment.
+"""
+import json
+import mmap
+import os
+import threading
+import zlib
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import DocumentLog, LogArchiveEntry
+
+_ACTION_LABELS = dict(DocumentLog.ACTION_CHOICES)
+_maps = {}
+_maps_lock = threading.Lock()
+
+
+def archive_dir():
+    return Path(getattr(settings, 'DMS_LOG_ARCHIVE_DIR', settings.BASE_DIR / 'log_archive'))
+
+
+def segment_size():
+    return getattr(settings, 'DMS_LOG_SEGMENT_SIZE', 64 * 1024 * 1024)
+
+
+class ArchivedLog:
+    """Read-only stand-in for a DocumentLog row restored from a segment."""
+
+    def __init__(self, action, user, notes, timestamp, user_id=None, username=None):
+        self.action = action
+        self.user = user
+        self.user_id = user_id
+        self.username = username
+        self.notes = notes
+        self.timestamp = parse_datetime(timestamp) if isinstance(timestamp, str) else timestamp
+
+    def get_action_display(self):
+        return _ACTION_LABELS.get(self.action, self.action)
+
+
+def _current_segment():
+    directory = archive_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    segments = sorted(directory.glob('segment-*.log'))
+    if segments and segments[-1].stat().st_size < segment_size():
+        return segments[-1]
+    number = int(segments[-1].stem.split('-')[1]) + 1 if segments else 1
+    return directory / f'segment-{number:06d}.log'
+
+
+def _encode(logs):
+    return zlib.compress(json.dumps([
+        {
+            'action': log.action,
+            'user_id': log.user_id,
+            'user': str(log.user) if log.user_id else None,
+            'username': log.user.username if log.user_id else None,
+            'notes': log.notes,
+            'timestamp': log.timestamp.isoformat(),
+        }
+        for log in logs
+    ]).encode())
+
+
+def archive_documents(documents):
+    """
+    Move the logs of ``documents`` into the segment files. The block is
+    fsynced before the rows are deleted, so a crash can at worst leave
+    unreferenced bytes in a segment. Not safe to run concurrently.
+    """
+    archived = 0
+    for doc in documents:
+        logs = list(doc.logs.select_related('user').order_by('timestamp', 'pk'))
+        if not logs:
+            continue
+        block = _encode(logs)
+        path = _current_segment()
+        with open(path, 'ab') as f:
+            offset = f.tell()
+            f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        with transaction.atomic():
+            LogArchiveEntry.objects.create(document=doc, segment=path.name, offset=offset,
+                                           length=len(block), count=len(logs))
+            DocumentLog.objects.filter(pk__in=[log.pk for log in logs]).delete()
+        archived += len(logs)
+    return archived
+
+
+def _mapped(segment, end):
+    with _maps_lock:
+        mm = _maps.get(segment)
+        if mm is None or len(mm) < end:
+            # Segments only grow; remap to see bytes appended since the last mapping. The old map
+            # isn't closed: another thread may still be slicing it, and it unmaps once unreferenced
+            with open(archive_dir() / segment, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            _maps[segment] = mm
+        return mm
+
+
+def read_entry(entry):
+    """The ArchivedLog rows of one LogArchiveEntry block, oldest first."""
+    mm = _mapped(entry.segment, entry.offset + entry.length)
+    records = json.loads(zlib.decompress(mm[entry.offset:entry.offset + entry.length]))
+    return [ArchivedLog(**record) for record in records]
+
+
+def read_archived_logs(document):
+    """The archived logs of ``document``, newest first."""
+    logs = []
+    for entry in document.log_archive_entries.order_by('pk'):
+        logs.extend(read_entry(entry))
+    # Blocks hold oldest-first; reverse before the (stable) sort so ties stay newest-first
+    logs.reverse()
+    logs.sort(key=lambda log: log.timestamp, reverse=True)
+    return logs
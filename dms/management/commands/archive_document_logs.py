@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dms.logarchive import archive_documents
+from dms.models import Document
+
+
+class Command(BaseCommand):
+    help = 'Move the DocumentLog rows of archived documents into compressed segment files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'DMS_LOG_ARCHIVE_AFTER_DAYS', 180),
+                            help='Only documents closed (last updated) more than this many days ago.')
+        parser.add_argument('--limit', type=int, default=None, help='Archive at most this many documents.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        docs = (Document.objects.filter(status='archived', updated_at__lt=cutoff, logs__isnull=False)
+                .distinct().order_by('pk').only('pk'))
+        if options['limit']:
+            docs = docs[:options['limit']]
+        moved = archive_documents(list(docs))
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} log rows.'))
@@ -0,0 +1,51 @@
+import gzip
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from dms.models import Notification, NotificationArchive
+
+
+class Command(BaseCommand):
+    help = 'Move read notifications older than the retention period out of the Notification table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'DMS_NOTIFICATION_RETENTION_DAYS', 90),
+                            help='Archive read notifications older than this many days.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--file', help='Append to this gzipped JSON-lines file instead of NotificationArchive.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        batch_size = options['batch_size']
+        stale = Notification.objects.filter(is_read=True, created_at__lt=cutoff).order_by('pk')
+        out = gzip.open(options['file'], 'at', encoding='utf-8') if options['file'] else None
+        moved = 0
+        last_pk = 0
+        try:
+            while True:
+                rows = list(stale.filter(pk__gt=last_pk)
+                            .values('pk', 'recipient_id', 'document_id', 'message', 'created_at')[:batch_size])
+                if not rows:
+                    break
+                last_pk = rows[-1]['pk']
+                with transaction.atomic():
+                    if out:
+                        for row in rows:
+                            out.write(json.dumps(row, default=str) + '\n')
+                    else:
+                        NotificationArchive.objects.bulk_create(
+                            NotificationArchive(recipient_id=r['recipient_id'], document_id=r['document_id'],
+                                                message=r['message'], created_at=r['created_at'])
+                            for r in rows
+                        )
+                    Notification.objects.filter(pk__in=[r['pk'] for r in rows]).delete()
+                moved += len(rows)
+        finally:
+            if out:
+                out.close()
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} notifications older than {options["days"]} days.'))
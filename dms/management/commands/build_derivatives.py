@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from dms import derivatives
+from dms.models import Derivative, Document
+
+
+class Command(BaseCommand):
+    help = 'Render the previews, thumbnails and signatures missing for already uploaded files.'
+
+    def handle(self, *args, **options):
+        done = {}
+        for blob_id, kind in Derivative.objects.values_list('blob_id', 'kind'):
+            done.setdefault(blob_id, set()).add(kind)
+        todo = {}
+        for field, kinds in derivatives.KINDS.items():
+            names = (Document.objects.filter(**{f'{field}__startswith': 'blobs/'})
+                     .values_list(field, flat=True).distinct().iterator())
+            for name in names:
+                if not set(kinds) <= done.get(name.rsplit('/', 1)[-1], set()):
+                    todo[field, name] = None
+        created = derivatives.render_many(list(todo))
+        self.stdout.write(self.style.SUCCESS(f'Rendered {created} derivatives for {len(todo)} files.'))
@@ -0,0 +1,71 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from dms import access
+from dms.models import Department, Document, DocumentLog, DocumentRouting, Notification, User
+from dms.queries import full_scans, hot_queries
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('EXPLAIN the role-scoped hot queries on a seeded dataset and fail if any of them '
+            'falls back to a full table scan. The seed data is rolled back afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=2000, help='Documents to seed.')
+
+    def handle(self, *args, **options):
+        failures = []
+        try:
+            with transaction.atomic():
+                sender, head = self.seed(options['documents'])
+                if connection.vendor == 'postgresql':
+                    # Small seeded tables make seq scans cheap; ask whether an index is usable at all
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE')
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+                for name, queryset in hot_queries(sender, head):
+                    scans = full_scans(queryset, connection)
+                    status = self.style.ERROR('FULL SCAN') if scans else self.style.SUCCESS('ok')
+                    self.stdout.write(f'{status:>20}  {name}')
+                    for line in scans:
+                        self.stdout.write(f'                      {line}')
+                    if scans:
+                        failures.append(name)
+                raise Rollback
+        except Rollback:
+            pass
+        if failures:
+            raise CommandError(f'{len(failures)} hot queries regressed to full scans: {", ".join(failures)}')
+
+    def seed(self, count):
+        rng = random.Random(42)
+        depts = Department.objects.bulk_create(
+            Department(name=f'Plan Check {i}', code=f'PLAN{i:03d}') for i in range(10))
+        users = []
+        for i in range(40):
+            users.append(User(username=f'plan-check-{i}', role=rng.choice(['dept_sender_receiver', 'dept_head']),
+                              department=rng.choice(depts)))
+        users = User.objects.bulk_create(users)
+        statuses = [s for s, _ in Document.STATUS_CHOICES]
+        docs = Document.objects.bulk_create(
+            Document(title=f'Plan check {i}', reference_number=f'PLAN-{i:07d}', source='internal',
+                     status=rng.choice(statuses), created_by=rng.choice(users), assigned_to=rng.choice(users),
+                     origin_department=rng.choice(depts), current_department=rng.choice(depts))
+            for i in range(count))
+        DocumentLog.objects.bulk_create(
+            DocumentLog(document=rng.choice(docs), user=rng.choice(users), action='created') for _ in range(count))
+        DocumentRouting.objects.bulk_create(
+            DocumentRouting(document=rng.choice(docs), from_department=rng.choice(depts),
+                            to_department=rng.choice(depts)) for _ in range(count // 4))
+        Notification.objects.bulk_create(
+            Notification(recipient=rng.choice(users), message='plan check') for _ in range(count))
+        access.rebuild()
+        sender = next(u for u in users if u.role == 'dept_sender_receiver')
+        head = next(u for u in users if u.role == 'dept_head')
+        return sender, head
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from dms.partitions import ensure_log_partitions
+
+
+class Command(BaseCommand):
+    help = 'Create monthly DocumentLog partitions ahead of time (PostgreSQL only). Run monthly from cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write('DocumentLog partitioning is only used on PostgreSQL; nothing to do.')
+            return
+        names = ensure_log_partitions(connection, months_ahead=options['months_ahead'])
+        self.stdout.write(self.style.SUCCESS(f'Ensured {len(names)} partitions: {", ".join(names)}'))
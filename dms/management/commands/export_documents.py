@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dms.export import EXPORTS, FORMATS, SEARCH_LIMIT, export
+from dms.forms import DocumentSearchForm
+from dms.models import Document
+from dms.queries import search_filtered
+
+
+class Command(BaseCommand):
+    help = 'Stream the document registry or audit trail as CSV/XLSX, filtered like the document list.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', '-o', help='File to write (default: standard output).')
+        parser.add_argument('--query', default='')
+        parser.add_argument('--status', default='')
+        parser.add_argument('--source', default='')
+
+    def handle(self, *args, **options):
+        form = DocumentSearchForm({f: options[f] for f in ('query', 'status', 'source')})
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        docs, _ = search_filtered(Document.objects.all(), form.cleaned_data, limit=SEARCH_LIMIT)
+        chunks, _ = export(options['kind'], options['format'], docs)
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from dms import extraction
+
+
+class Command(BaseCommand):
+    help = 'Extract searchable text from attachments that have none yet, across the extraction process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry jobs that failed before.')
+
+    def handle(self, *args, **options):
+        outcomes = extraction.run_pending(retry_failed=options['retry_failed'])
+        summary = ', '.join(f'{n} {status}' for status, n in sorted(outcomes.items())) or 'nothing to do'
+        self.stdout.write(self.style.SUCCESS(f'Text extraction: {summary}.'))
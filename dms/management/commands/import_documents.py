@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dms.intake import CHUNK_SIZE, directory_files, import_manifest, read_manifest
+from dms.models import Department, User
+
+
+class Command(BaseCommand):
+    help = 'Create external documents in bulk from a CSV or JSONL manifest (columns: title, description, ' \
+           'correspondent_name, correspondent_agency, classification, file).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help='Path to a .csv or .jsonl manifest.')
+        parser.add_argument('--user', required=True, help='Username recorded as the creator.')
+        parser.add_argument('--department', help="Department code (default: the user's department).")
+        parser.add_argument('--files-dir', help="Directory the manifest's file column is relative to.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['user']}")
+        department = None
+        if options['department']:
+            department = Department.objects.filter(code=options['department']).first()
+            if department is None:
+                raise CommandError(f"No department with code {options['department']}")
+        open_file = directory_files(options['files_dir']) if options['files_dir'] else None
+
+        started = time.monotonic()
+
+        def progress(result):
+            rate = result.created / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(f'{result.created} documents ({rate:.0f}/s), {len(result.errors)} rows skipped')
+
+        with open(options['manifest'], 'rb') as stream:
+            result = import_manifest(read_manifest(stream, name=options['manifest']), user, department=department,
+                                     open_file=open_file, chunk_size=options['chunk_size'], progress=progress)
+        for line, message in result.errors:
+            self.stderr.write(f'line {line}: {message}')
+        self.stdout.write(self.style.SUCCESS(f'Imported {result.created} documents.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from dms import access
+
+
+class Command(BaseCommand):
+    help = 'Recompute the document visibility table behind Document.objects.visible_to().'
+
+    def handle(self, *args, **options):
+        rows = access.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} document access rows.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from dms import stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-scope document status counters shown on the dashboard.'
+
+    def handle(self, *args, **options):
+        rows = stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} document stat rows.'))
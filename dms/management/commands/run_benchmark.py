@@ -0,0 +1,78 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dms import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Drive every route in dms.urls with concurrent virtual users and report latency percentiles, '
+            'query counts and peak RSS per scenario. Needs seed_benchmark_data: POST scenarios route and '
+            'archive seeded documents for real, and nothing else is touched.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=8, help='Concurrent virtual users per scenario.')
+        parser.add_argument('--requests', type=int, default=50, help='Recorded requests per virtual user.')
+        parser.add_argument('--warmup', type=int, default=2, help='Unrecorded requests per virtual user first.')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Only scenarios whose name starts with this (repeatable).')
+        parser.add_argument('--host', default='localhost', help='Host header sent (must be in ALLOWED_HOSTS).')
+        parser.add_argument('--output', help='Write the report to this JSON file (e.g. to make a baseline).')
+        parser.add_argument('--baseline', help='Compare against this JSON report; fails on regressions.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p95 latency growth over the baseline, as a fraction.')
+        parser.add_argument('--list', action='store_true', help='List the scenarios and exit.')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for scenario in benchmark.SCENARIOS:
+                self.stdout.write(f'{scenario.name:<36} {scenario.role or "anonymous"}')
+            for name, reason in benchmark.SKIPPED.items():
+                self.stdout.write(f'{"(skipped) " + name:<36} {reason}')
+            return
+        for name in benchmark.uncovered():
+            self.stderr.write(self.style.WARNING(f'No benchmark scenario drives the {name!r} route.'))
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        self.stdout.write(f'{"scenario":<36} {"reqs":>5} {"err":>4} {"p50":>8} {"p95":>8} {"p99":>8} '
+                          f'{"queries":>8} {"rss MiB":>8}')
+
+        def progress(name, result):
+            latency = result['latency_ms']
+            self.stdout.write(
+                f'{name:<36} {result["requests"]:>5} {result["errors"]:>4} {latency["p50"]:>8.1f} '
+                f'{latency["p95"]:>8.1f} {latency["p99"]:>8.1f} {result["queries"]["median"]:>8} '
+                f'{result["peak_rss_kb"] / 1024:>8.0f}')
+
+        # The file/preview scenarios 404 on seeded documents by design; keep those warnings out of the table
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            report = benchmark.run(options['scenarios'], users=options['users'], requests=options['requests'],
+                                   warmup=options['warmup'], host=options['host'], progress=progress)
+        except benchmark.NotSeeded as exc:
+            raise CommandError(str(exc))
+        finally:
+            request_logger.setLevel(level)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}.')
+        if baseline is None:
+            return
+
+        regressions = []
+        for name, metric, old, new, regressed in benchmark.compare(baseline, report, options['tolerance']):
+            if regressed:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f'REGRESSED  {name}: {metric} {old} -> {new}'))
+            elif new < old:
+                self.stdout.write(self.style.SUCCESS(f'improved   {name}: {metric} {old} -> {new}'))
+        if regressions:
+            raise CommandError(f'{len(set(regressions))} scenarios regressed against {options["baseline"]}.')
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
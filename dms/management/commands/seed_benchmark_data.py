@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dms import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Fill the database with a synthetic, production-sized dataset for run_benchmark. '
+            'Use a dedicated database: the rows are not cleaned up.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=20)
+        parser.add_argument('--users-per-department', type=int, default=25,
+                            help='One department head, the rest senders/receivers (at least 2).')
+        parser.add_argument('--documents', type=int, default=1_000_000)
+        parser.add_argument('--logs-per-document', type=int, default=10, help='Average log entries per document.')
+        parser.add_argument('--notifications-per-user', type=int, default=200)
+        parser.add_argument('--long-histories', type=int, default=10,
+                            help='Recent documents given a very long history.')
+        parser.add_argument('--long-history-length', type=int, default=2000)
+        parser.add_argument('--days', type=int, default=730, help='Spread creation dates over this many days.')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, for repeatable datasets.')
+
+    def handle(self, *args, **options):
+        if options['departments'] < 1 or options['users_per_department'] < 2:
+            raise CommandError('Need at least one department and two users per department.')
+        started = time.monotonic()
+
+        def progress(phase, done, total):
+            self.stdout.write(f'{phase}: {done}/{total} ({time.monotonic() - started:.0f}s)')
+
+        try:
+            created = benchmark.seed(
+                departments=options['departments'], users_per_department=options['users_per_department'],
+                documents=options['documents'], logs_per_document=options['logs_per_document'],
+                notifications_per_user=options['notifications_per_user'],
+                long_histories=options['long_histories'], long_history_length=options['long_history_length'],
+                days=options['days'], chunk_size=options['chunk_size'], rng_seed=options['seed'],
+                progress=progress,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        summary = ', '.join(f'{n} {name}' for name, n in created.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {summary} in {time.monotonic() - started:.0f}s. Users log in with password '
+            f'"{benchmark.PASSWORD}".'))
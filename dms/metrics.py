@@ -0,0 +1,212 @@
+# metrics.py
+"""
+Per-request performance metrics, exposed in Prometheus text format.
+
+MetricsMiddleware times every request and, through
+connection.execute_wrapper, counts and times its database queries.
+Template rendering is timed by wrapping Template._render, the same hook
+Django's test runner instruments. Results go into in-process histograms
+served by metrics_view at /metrics/ to superusers, to scrapers sending
+``Authorization: Bearer <DMS_METRICS_TOKEN>`` and to the addresses in
+DMS_METRICS_ALLOWED_IPS (empty by default). Under gunicorn every worker keeps
+its own numbers; scrape each worker or run one per port.
+
+A request that issues more than DMS_QUERY_BUDGET queries is logged as a
+warning on the 'dms.metrics' logger, with the SQL it ran.
+"""
+import hmac
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template import base as template_base
+
+logger = logging.getLogger('dms.metrics')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_request = ContextVar('dms_metrics_request', default=None)
+
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items())
+        for labels, (counts, total, count) in series:
+            base = _labels(self.labels, labels)
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{base}{"," if base else ""}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base}{"," if base else ""}le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{base}}} {total}')
+            lines.append(f'{self.name}_count{{{base}}} {count}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + 1
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f'{self.name}{{{_labels(self.labels, labels)}}} {value}' for labels, value in values)
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+REQUEST_SECONDS = Histogram('dms_request_duration_seconds', 'Time spent handling the request.',
+                            ('view', 'method', 'status'))
+REQUEST_QUERIES = Histogram('dms_request_queries', 'Database queries issued per request.', ('view',),
+                            buckets=QUERY_BUCKETS)
+REQUEST_DB_SECONDS = Histogram('dms_request_db_seconds', 'Time spent in database queries per request.', ('view',))
+TEMPLATE_SECONDS = Histogram('dms_template_render_seconds', 'Time spent rendering each top-level template.',
+                             ('template',))
+BUDGET_EXCEEDED = Counter('dms_query_budget_exceeded_total', 'Requests that went over DMS_QUERY_BUDGET.', ('view',))
+METRICS = (REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_DB_SECONDS, TEMPLATE_SECONDS, BUDGET_EXCEEDED)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = []
+        self.db_seconds = 0.0
+        self.template_depth = 0
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _request.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            elapsed = time.perf_counter() - started
+            stats.db_seconds += elapsed
+            stats.queries.append((sql, elapsed))
+
+
+_original_render = template_base.Template._render
+
+
+def _timed_render(self, context):
+    stats = _request.get()
+    if stats is None or stats.template_depth:
+        # Outside a request, or an {% extends %}/{% include %} already counted by its parent
+        return _original_render(self, context)
+    stats.template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        stats.template_depth -= 1
+        TEMPLATE_SECONDS.observe(time.perf_counter() - started, self.origin.template_name or '<string>')
+
+
+def install_template_timer():
+    if template_base.Template._render is _original_render:
+        template_base.Template._render = _timed_render
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else '<unresolved>'
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_template_timer()
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _request.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_record_query))
+                response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        elapsed = time.perf_counter() - started
+
+        view = _view_name(request)
+        REQUEST_SECONDS.observe(elapsed, view, request.method, response.status_code)
+        REQUEST_QUERIES.observe(len(stats.queries), view)
+        REQUEST_DB_SECONDS.observe(stats.db_seconds, view)
+        budget = getattr(settings, 'DMS_QUERY_BUDGET', None)
+        if budget is not None and len(stats.queries) > budget:
+            BUDGET_EXCEEDED.inc(view)
+            logger.warning(
+                '%s %s (%s) ran %d queries (budget %d) in %.1f ms:\n%s',
+                request.method, request.path, view, len(stats.queries), budget, stats.db_seconds * 1000,
+                '\n'.join(f'  {ms * 1000:6.1f} ms  {sql[:300]}' for sql, ms in stats.queries[:100]),
+            )
+        return response
+
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.expose())
+    return '\n'.join(lines) + '\n'
+
+
+def _authorized(request):
+    if request.user.is_superuser:
+        return True
+    token = getattr(settings, 'DMS_METRICS_TOKEN', None)
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    # Behind a reverse proxy every request comes from the proxy's address, so this list is opt-in
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'DMS_METRICS_ALLOWED_IPS', ())
+
+
+def metrics_view(request):
+    if not _authorized(request):
+        return HttpResponseForbidden('Metrics need a superuser login or the scrape token.')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:23
+
+from django.db import migrations, models
+
+
+def backfill_stats(apps, schema_editor):
+    from dms.stats import rebuild
+    rebuild(apps.get_model('dms', 'Document'), apps.get_model('dms', 'DocumentStat'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dms', '0002_document_created_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('all', 'All Documents'), ('department', 'Department'), ('user', 'User')], max_length=20)),
+                ('scope_id', models.BigIntegerField(default=0)),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('pending_review', 'Pending Review'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('esigned', 'E-Signed'), ('released', 'Released to Correspondent'), ('returned', 'Returned to Origin'), ('archived', 'Archived'), ('return_for_revision', 'Returned for Revision')], max_length=30)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='documentstat',
+            constraint=models.UniqueConstraint(fields=('scope', 'scope_id', 'status'), name='dms_docstat_scope_status_uniq'),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations
+
+# The index schema as of this migration; dms.search may change, this must not.
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS dms_document_fts USING fts5("
+    "title, reference_number, description, correspondent_name, correspondent_agency, "
+    "tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO dms_document_fts (rowid, title, reference_number, description, correspondent_name, "
+    "correspondent_agency) "
+    "SELECT id, title, reference_number, description, correspondent_name, correspondent_agency FROM dms_document",
+]
+
+POSTGRES_CREATE = [
+    "CREATE TABLE IF NOT EXISTS dms_document_search ("
+    "document_id bigint PRIMARY KEY REFERENCES dms_document(id) ON DELETE CASCADE, "
+    "vector tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS dms_document_search_vector_gin ON dms_document_search USING GIN (vector)",
+    "INSERT INTO dms_document_search (document_id, vector) SELECT id, "
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(reference_number, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C') || "
+    "setweight(to_tsvector('simple', coalesce(correspondent_name, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(correspondent_agency, '')), 'B') "
+    "FROM dms_document",
+]
+
+DROP = {
+    'sqlite': ['DROP TABLE IF EXISTS dms_document_fts'],
+    'postgresql': ['DROP TABLE IF EXISTS dms_document_search'],
+}
+
+
+def _run(schema_editor, statements):
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE})
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dms', '0003_document_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
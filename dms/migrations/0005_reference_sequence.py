@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dms', '0004_document_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('scope', models.CharField(blank=True, max_length=20)),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='referencesequence',
+            constraint=models.UniqueConstraint(fields=('year', 'scope'), name='dms_refseq_year_scope_uniq'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    User = apps.get_model('dms', 'User')
+    Notification = apps.get_model('dms', 'Notification')
+    NotificationCounter = apps.get_model('dms', 'NotificationCounter')
+    unread = dict(Notification.objects.filter(is_read=False).order_by()
+                  .values_list('recipient_id').annotate(n=Count('id')))
+    NotificationCounter.objects.bulk_create(
+        NotificationCounter(user_id=pk, unread=unread.get(pk, 0))
+        for pk in User.objects.values_list('pk', flat=True).iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dms', '0005_reference_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:29
+
+from datetime import date
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def _month_start(d, offset=0):
+    month = d.month - 1 + offset
+    return date(d.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_logs(apps, schema_editor):
+    """
+    Rebuild dms_documentlog partitioned by month on ``timestamp`` (PostgreSQL only).
+
+    The SQL is frozen here on purpose. It differs from the model state in one
+    way: PostgreSQL needs the partition key in the primary key, so
+    dms_documentlog_pkey covers (id, timestamp). The indexes and foreign keys
+    the earlier migrations created are copied over under their own names, so
+    later schema changes still find them.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    table = 'dms_documentlog'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s "
+            "AND indexname <> %s", [table, f'{table}_pkey'])
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass "
+            "AND contype = 'f'", [table])
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT min(timestamp), max(timestamp) FROM {table}')
+        oldest, newest = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {table}_unpartitioned')
+        # Index names are per schema; the other indexes are recreated once the old table is gone
+        cursor.execute(f'ALTER TABLE {table}_unpartitioned RENAME CONSTRAINT {table}_pkey TO {table}_pkey_old')
+
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {table}_part_id_seq')
+        cursor.execute(f"""
+            CREATE TABLE {table} (
+                id bigint NOT NULL DEFAULT nextval('{table}_part_id_seq'),
+                action varchar(20) NOT NULL,
+                notes text NOT NULL,
+                timestamp timestamp with time zone NOT NULL,
+                document_id bigint NOT NULL,
+                user_id bigint NULL,
+                CONSTRAINT {table}_pkey PRIMARY KEY (id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
+        """)
+        cursor.execute(f'ALTER SEQUENCE {table}_part_id_seq OWNED BY {table}.id')
+        cursor.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+        today = date.today()
+        start = _month_start(oldest.date() if oldest else today)
+        last = _month_start(max(today, newest.date()) if newest else today, 3)
+        while start <= last:
+            end = _month_start(start, 1)
+            cursor.execute(
+                f'CREATE TABLE {table}_y{start.year}m{start.month:02d} PARTITION OF {table} '
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+            start = end
+
+        cursor.execute(
+            f'INSERT INTO {table} (id, action, notes, timestamp, document_id, user_id) '
+            f'SELECT id, action, notes, timestamp, document_id, user_id FROM {table}_unpartitioned'
+        )
+        cursor.execute(
+            f"SELECT setval('{table}_part_id_seq', coalesce((SELECT max(id) FROM {table}), 0) + 1, false)"
+        )
+        cursor.execute(f'DROP TABLE {table}_unpartitioned')
+        # pg_indexes' definitions name the table, which is now the partitioned one
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dms', '0007_notification_inbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogArchiveEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('segment', models.CharField(max_length=100)),
+                ('offset', models.BigIntegerField()),
+                ('length', models.IntegerField()),
+                ('count', models.IntegerField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='log_archive_entries', to='dms.document')),
+            ],
+        ),
+        migrations.RunPython(partition_logs, migrations.RunPython.noop),
+    ]
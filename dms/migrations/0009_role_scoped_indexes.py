@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dms', '0008_log_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['created_by', 'status', '-created_at'], name='dms_doc_creator_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['assigned_to', 'status', '-created_at'], name='dms_doc_assignee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['current_department', 'status', '-created_at'], name='dms_doc_cur_dept_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['origin_department', 'status', '-created_at'], name='dms_doc_origin_dept_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['status', '-created_at'], name='dms_doc_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['-updated_at'], name='dms_doc_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documentlog',
+            index=models.Index(fields=['document', '-timestamp'], name='dms_log_doc_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documentrouting',
+            index=models.Index(fields=['document', 'forwarded_at'], name='dms_routing_doc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['department', 'role'], name='dms_user_dept_role_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:35
+
+import os
+
+from django.db import migrations, models
+
+import dms.storage
+
+
+def backfill_file_names(apps, schema_editor):
+    Document = apps.get_model('dms', 'Document')
+    for doc in Document.objects.exclude(file='').exclude(file__isnull=True).only('pk', 'file').iterator():
+        Document.objects.filter(pk=doc.pk).update(file_name=os.path.basename(doc.file.name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dms', '0009_role_scoped_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('size', models.BigIntegerField()),
+                ('refcount', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='file_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='esignature',
+            field=models.ImageField(blank=True, null=True, storage=dms.storage.get_blob_storage, upload_to='signatures/%Y/%m/'),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='file',
+            field=models.FileField(blank=True, null=True, storage=dms.storage.get_blob_storage, upload_to='documents/%Y/%m/'),
+        ),
+        migrations.RunPython(backfill_file_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dms', '0010_blob_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Derivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('preview', 'Preview'), ('thumbnail', 'Thumbnail'), ('signature', 'Signature')], max_length=20)),
+                ('name', models.CharField(max_length=255)),
+                ('width', models.IntegerField()),
+                ('height', models.IntegerField()),
+                ('size', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('blob', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='derivatives', to='dms.blob')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='derivative',
+            constraint=models.UniqueConstraint(fields=('blob', 'kind'), name='dms_derivative_blob_kind_uniq'),
+        ),
+    ]
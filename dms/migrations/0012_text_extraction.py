@@ -0,0 +1,70 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# The index schema with the attachment text column; dms.search may change, this must not.
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS dms_document_fts USING fts5("
+    "title, reference_number, description, correspondent_name, correspondent_agency, content, "
+    "tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO dms_document_fts (rowid, title, reference_number, description, correspondent_name, "
+    "correspondent_agency, content) "
+    "SELECT id, title, reference_number, description, correspondent_name, correspondent_agency, '' "
+    "FROM dms_document",
+]
+
+POSTGRES_CREATE = [
+    "CREATE TABLE IF NOT EXISTS dms_document_search ("
+    "document_id bigint PRIMARY KEY REFERENCES dms_document(id) ON DELETE CASCADE, "
+    "vector tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS dms_document_search_vector_gin ON dms_document_search USING GIN (vector)",
+    "INSERT INTO dms_document_search (document_id, vector) SELECT id, "
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(reference_number, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C') || "
+    "setweight(to_tsvector('simple', coalesce(correspondent_name, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(correspondent_agency, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce('', '')), 'D') "
+    "FROM dms_document",
+]
+
+DROP = {
+    'sqlite': 'DROP TABLE IF EXISTS dms_document_fts',
+    'postgresql': 'DROP TABLE IF EXISTS dms_document_search',
+}
+
+
+def add_content_column(apps, schema_editor):
+    # FTS5 tables can't gain columns; rebuild the index with the attachment text column
+    vendor = schema_editor.connection.vendor
+    if vendor not in DROP:
+        return
+    schema_editor.execute(DROP[vendor])
+    for sql in SQLITE_CREATE if vendor == 'sqlite' else POSTGRES_CREATE:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dms', '0011_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextExtraction',
+            fields=[
+                ('blob', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='text', serialize=False, to='dms.blob')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('unsupported', 'Unsupported'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20)),
+                ('text', models.TextField(blank=True)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('attempts', models.IntegerField(default=0)),
+                ('queued_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(add_content_column, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_access(apps, schema_editor):
+    from dms.access import rebuild
+    rebuild(apps.get_model('dms', 'Document'), apps.get_model('dms', 'DocumentAccess'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dms', '0012_text_extraction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('department', 'Department'), ('user', 'User')], max_length=20)),
+                ('scope_id', models.BigIntegerField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='access', to='dms.document')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='documentaccess',
+            constraint=models.UniqueConstraint(fields=('scope', 'scope_id', 'document'), name='dms_docaccess_uniq'),
+        ),
+        migrations.RunPython(backfill_access, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 05:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dms', '0013_document_access'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='textextraction',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='textextraction',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('unsupported', 'Unsupported'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20),
+        ),
+    ]
@@ -1,7 +1,11 @@
+import os
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 
+from .storage import get_blob_storage
+
 
 class User(AbstractUser):
     ROLE_CHOICES = [
@@ -14,6 +18,12 @@ class User(AbstractUser):
     role = models.CharField(max_length=30, choices=ROLE_CHOICES, default='dept_sender_receiver')
     department = models.ForeignKey('Department', on_delete=models.SET_NULL, null=True, blank=True, related_name='members')
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # notify_department: members of a department with a given role
+            models.Index(fields=['department', 'role'], name='dms_user_dept_role_idx'),
+        ]
+
     def __str__(self):
         return f"{self.get_full_name() or self.username} ({self.get_role_display()})"
 
@@ -27,6 +37,22 @@ class Department(models.Model):
         return self.name
 
 
+class DocumentQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        The documents ``user`` may see: senders/receivers the ones they
+        created or are assigned, department heads, governors and executives
+        the ones in or from their office, everyone else all of them. One
+        indexed join on DocumentAccess (kept current by dms.access).
+        """
+        from .stats import scope_for_user
+
+        scope, scope_id = scope_for_user(user)
+        if scope == 'all':
+            return self
+        return self.filter(access__scope=scope, access__scope_id=scope_id)
+
+
 class Document(models.Model):
     SOURCE_CHOICES = [('internal', 'Internal'), ('external', 'External')]
     STATUS_CHOICES = [
@@ -54,8 +80,9 @@ class Document(models.Model):
     status = models.CharField(max_length=30, choices=STATUS_CHOICES, default='draft')
     action_type = models.CharField(max_length=10, choices=ACTION_TYPE_CHOICES, blank=True, null=True)
     description = models.TextField(blank=True)
-    file = models.FileField(upload_to='documents/%Y/%m/', blank=True, null=True)
-    esignature = models.ImageField(upload_to='signatures/%Y/%m/', blank=True, null=True)
+    file = models.FileField(upload_to='documents/%Y/%m/', storage=get_blob_storage, blank=True, null=True)
+    file_name = models.CharField(max_length=255, blank=True)
+    esignature = models.ImageField(upload_to='signatures/%Y/%m/', storage=get_blob_storage, blank=True, null=True)
 
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_documents')
     assigned_to = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_documents')
@@ -68,11 +95,29 @@ class Document(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     logged_at = models.DateTimeField(null=True, blank=True)
 
+    objects = DocumentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination in document_list walks (-created_at, -id)
+            models.Index(fields=['-created_at', '-id'], name='dms_doc_created_id_idx'),
+            # One per creator/assignee/office column, then status, then list order
+            models.Index(fields=['created_by', 'status', '-created_at'], name='dms_doc_creator_idx'),
+            models.Index(fields=['assigned_to', 'status', '-created_at'], name='dms_doc_assignee_idx'),
+            models.Index(fields=['current_department', 'status', '-created_at'], name='dms_doc_cur_dept_idx'),
+            models.Index(fields=['origin_department', 'status', '-created_at'], name='dms_doc_origin_dept_idx'),
+            models.Index(fields=['status', '-created_at'], name='dms_doc_status_idx'),
+            # Dashboard "recent documents"
+            models.Index(fields=['-updated_at'], name='dms_doc_updated_idx'),
+        ]
+
     def save(self, *args, **kwargs):
+        if self.file and not self.file._committed:
+            # Stored under its content hash, so keep the uploaded name for downloads
+            self.file_name = os.path.basename(self.file.name)
         if not self.reference_number:
-            from django.utils.timezone import now
-            count = Document.objects.count() + 1
-            self.reference_number = f"DOC-{now().year}-{count:05d}"
+            from .references import reserve_reference_numbers
+            self.reference_number = reserve_reference_numbers(1, department=self.origin_department)[0]
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -88,6 +133,11 @@ class DocumentRouting(models.Model):
     notes = models.TextField(blank=True)
     completed = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['document', 'forwarded_at'], name='dms_routing_doc_idx'),
+        ]
+
     def __str__(self):
         return f"{self.document} → {self.to_department}"
 
@@ -118,6 +168,9 @@ class DocumentLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['document', '-timestamp'], name='dms_log_doc_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.document} - {self.get_action_display()} by {self.user}"
@@ -132,6 +185,154 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'is_read', '-created_at'], name='dms_notif_unread_idx'),
+            models.Index(fields=['recipient', '-created_at', '-id'], name='dms_notif_inbox_idx'),
+        ]
 
     def __str__(self):
         return f"Notif for {self.recipient}: {self.message[:50]}"
+
+
+class NotificationArchive(models.Model):
+    """Read notifications past retention, moved out of the hot table by archive_notifications."""
+    recipient_id = models.BigIntegerField(db_index=True)
+    document_id = models.BigIntegerField(null=True, blank=True)
+    message = models.TextField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived notif for {self.recipient_id}: {self.message[:50]}"
+
+
+class Blob(models.Model):
+    """One stored file in dms.storage.BlobStorage, shared by every upload with the same content."""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.BigIntegerField()
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.refcount} refs)"
+
+
+class Derivative(models.Model):
+    """A small rendition of a blob (preview, thumbnail, normalised signature) built by dms.derivatives."""
+    KIND_CHOICES = [
+        ('preview', 'Preview'),
+        ('thumbnail', 'Thumbnail'),
+        ('signature', 'Signature'),
+    ]
+    blob = models.ForeignKey(Blob, on_delete=models.CASCADE, related_name='derivatives')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    name = models.CharField(max_length=255)
+    width = models.IntegerField()
+    height = models.IntegerField()
+    size = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['blob', 'kind'], name='dms_derivative_blob_kind_uniq')]
+
+    def __str__(self):
+        return f"{self.kind} of {self.blob_id[:12]}"
+
+
+class TextExtraction(models.Model):
+    """
+    Plain text pulled out of a blob for search (see dms.extraction). The row
+    is also the extraction job: it is created 'pending', claimed as
+    'running' by one worker and survives restarts until a worker finishes it.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('unsupported', 'Unsupported'),
+        ('failed', 'Failed'),
+    ]
+    blob = models.OneToOneField(Blob, on_delete=models.CASCADE, primary_key=True, related_name='text')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    text = models.TextField(blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    attempts = models.IntegerField(default=0)
+    queued_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.blob_id[:12]}: {self.status}"
+
+
+class ReferenceSequence(models.Model):
+    """Last reference number handed out per year (and department, if numbering per office)."""
+    year = models.IntegerField()
+    scope = models.CharField(max_length=20, blank=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'scope'], name='dms_refseq_year_scope_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.year}/{self.scope or '*'}: {self.last_value}"
+
+
+class DocumentStat(models.Model):
+    """Per-scope document counts by status, kept current by dms.signals."""
+    SCOPE_CHOICES = [('all', 'All Documents'), ('department', 'Department'), ('user', 'User')]
+
+    scope = models.CharField(max_length=20, choices=SCOPE_CHOICES)
+    scope_id = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=30, choices=Document.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'scope_id', 'status'], name='dms_docstat_scope_status_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.scope_id} {self.status}={self.count}"
+
+
+class DocumentAccess(models.Model):
+    """Who may see a document: its creator and assignee ('user') and its offices ('department'). See dms.access."""
+    SCOPE_CHOICES = [('department', 'Department'), ('user', 'User')]
+
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='access')
+    scope = models.CharField(max_length=20, choices=SCOPE_CHOICES)
+    scope_id = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            # Also the index visible_to() joins through
+            models.UniqueConstraint(fields=['scope', 'scope_id', 'document'], name='dms_docaccess_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.document_id} -> {self.scope}:{self.scope_id}"
+
+
+class NotificationCounter(models.Model):
+    """Denormalized unread-notification count per user, maintained by dms.unread."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+
+class LogArchiveEntry(models.Model):
+    """Where a block of a document's archived DocumentLog rows lives in the segment files (see dms.logarchive)."""
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='log_archive_entries')
+    segment = models.CharField(max_length=100)
+    offset = models.BigIntegerField()
+    length = models.IntegerField()
+    count = models.IntegerField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.document_id} @ {self.segment}:{self.offset} ({self.count} logs)"
@@ -0,0 +1,102 @@
+# pagecache.py
+"""
+Cached page data for the dashboard, the first document-list page and the
+detail timeline.
+
+Every cached value depends on a few scopes: 'all', 'user:<id>' (documents
+a user created or is assigned), 'department:<id>' (documents in or from
+an office), 'document:<id>' (one document's logs and routings) and
+'inbox:<id>' (a user's notifications). Each scope has a version in the
+cache, and the versions are part of the value's key. A write bumps only
+the versions of the scopes it touches, once its transaction commits
+(see dms.signals and the bulk paths in dms.workflow and dms.intake).
+Stale entries are never read again and simply expire. Names of users and
+offices shown in a cached page can lag by up to DMS_PAGE_CACHE_TIMEOUT.
+
+Entries are built on a read replica only once their versions are older
+than the replica lag window (see dms.replicas).
+
+Versions live in the configured cache, so with several server processes
+it must be a shared one (Redis, Memcached, the file cache), not locmem.
+DMS_PAGE_CACHE_TIMEOUT therefore defaults to 0 (off), and the dms.E001
+check refuses it with a per-process cache outside DEBUG.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+
+from . import replicas
+from .stats import scope_for_user
+
+DEFAULT_TIMEOUT = 0
+PROCESS_LOCAL_BACKENDS = ('LocMemCache',)
+
+
+def _version_key(scope):
+    return f'dms:v:{scope}'
+
+
+def shared():
+    """Whether the default cache is seen by every server process (and so by every invalidation)."""
+    return type(caches['default']).__name__ not in PROCESS_LOCAL_BACKENDS
+
+
+def _timeout():
+    return getattr(settings, 'DMS_PAGE_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def versions(scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # Unknown (new or evicted) scope: start it at a version no old entry can carry
+            found[key] = cache.get_or_set(key, time.time_ns(), timeout=None)
+    return [found[key] for key in keys]
+
+
+def cached(name, scopes, build, *parts):
+    """``build()``, cached under ``name`` and ``parts`` until one of ``scopes`` is invalidated."""
+    timeout = _timeout()
+    if not timeout:
+        return build()
+    current = versions(scopes)
+    tag = ','.join(f'{scope}={version}' for scope, version in zip(scopes, current))
+    key = ':'.join(['dms:page', name, *map(str, parts), tag])
+    value = cache.get(key)
+    if value is None:
+        # A replica may not have the write behind a fresh version yet
+        with replicas.read_after(max(current, default=0)):
+            value = build()
+            cache.set(key, value, timeout)
+    return value
+
+
+def invalidate(scopes):
+    """Bump ``scopes`` when the current transaction commits (immediately outside one)."""
+    keys = {_version_key(scope) for scope in scopes}
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, time.time_ns()), timeout=None))
+
+
+def _scope(scope, scope_id):
+    return 'all' if scope == 'all' else f'{scope}:{scope_id}'
+
+
+def document_scopes(stat_keys, pk=None):
+    """Page-cache scopes for a document's dms.stats scope keys (and its own timeline if ``pk``)."""
+    scopes = {_scope(scope, scope_id) for scope, scope_id, _ in stat_keys}
+    if pk is not None:
+        scopes.add(f'document:{pk}')
+    return scopes
+
+
+def visible_scopes(user):
+    """The scope of Document.objects.visible_to(user)."""
+    return [_scope(*scope_for_user(user))]
+
+
+def dashboard_scopes(user):
+    return visible_scopes(user) + [f'inbox:{user.pk}']
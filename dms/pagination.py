@@ -0,0 +1,126 @@
+# pagination.py
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidCursor(token) from exc
+
+
+def approximate_count(queryset, cap=1000):
+    """Count up to ``cap`` rows; returns (count, is_capped)."""
+    count = queryset.order_by()[:cap + 1].count()
+    return min(count, cap), count > cap
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, prev_cursor):
+        self.object_list = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over (-created_at, -id), or another timestamp
+    ``field``. Each page costs one indexed range scan of ``per_page + 1``
+    rows no matter how deep the reader goes.
+    """
+
+    def __init__(self, queryset, per_page=25, field='created_at'):
+        self.field = field
+        self.queryset = queryset.order_by(f'-{field}', '-id')
+        self.per_page = per_page
+
+    def page(self, after=None, before=None):
+        qs = self.queryset
+        field = self.field
+        backwards = False
+        if after:
+            value, pk = decode_cursor(after)
+            qs = qs.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+        elif before:
+            value, pk = decode_cursor(before)
+            qs = qs.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}))
+            qs = qs.order_by(field, 'id')
+            backwards = True
+
+        rows = list(qs[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage(rows, None, None)
+        first = encode_cursor(getattr(rows[0], field), rows[0].pk)
+        last = encode_cursor(getattr(rows[-1], field), rows[-1].pk)
+        if backwards:
+            next_cursor, prev_cursor = last, first if has_more else None
+        else:
+            next_cursor = last if has_more else None
+            prev_cursor = first if (after or before) else None
+        return KeysetPage(rows, next_cursor, prev_cursor)
+
+
+class RankedPaginator:
+    """
+    Pages through an already-ranked list of ids (e.g. search hits). Cursors
+    are positions in that list, so each page is one primary-key lookup.
+    """
+
+    def __init__(self, ids, queryset, per_page=25):
+        self.ids = ids
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def _position(self, token):
+        try:
+            return max(int(token), 0)
+        except ValueError as exc:
+            raise InvalidCursor(token) from exc
+
+    def page(self, after=None, before=None):
+        start = 0
+        if after:
+            start = self._position(after)
+        elif before:
+            start = max(self._position(before) - self.per_page, 0)
+        end = start + self.per_page
+        page_ids = self.ids[start:end]
+        rows = self.queryset.in_bulk(page_ids)
+        items = [rows[pk] for pk in page_ids if pk in rows]
+        next_cursor = str(end) if end < len(self.ids) else None
+        prev_cursor = str(start) if start > 0 else None
+        return KeysetPage(items, next_cursor, prev_cursor)
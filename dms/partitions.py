@@ -0,0 +1,64 @@
+# partitions.py
+"""
+Monthly range partitioning of dms_documentlog on PostgreSQL.
+
+Migration 0008 swaps the plain table for one partitioned on ``timestamp``
+(primary key (id, timestamp), as PostgreSQL requires the partition key in
+it), with a default partition for rows no monthly one covers.
+ensure_log_partitions() keeps a partition ready for each upcoming month;
+it is a no-op on other databases.
+"""
+from datetime import date
+
+from django.db import transaction
+from django.utils import timezone
+
+LOG_TABLE = 'dms_documentlog'
+DEFAULT_PARTITION = f'{LOG_TABLE}_default'
+
+
+def _month_start(d, offset=0):
+    month = d.month - 1 + offset
+    return date(d.year + month // 12, month % 12 + 1, 1)
+
+
+def _partition_name(start):
+    return f'{LOG_TABLE}_y{start.year}m{start.month:02d}'
+
+
+def _create_partition(cursor, name, start, end):
+    bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    cursor.execute(
+        f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= %s AND timestamp < %s)', [start, end])
+    if not cursor.fetchone()[0]:
+        cursor.execute(f'CREATE TABLE {name} PARTITION OF {LOG_TABLE} {bounds}')
+        return
+    # Rows for this month already landed in the default partition (e.g. a missed cron run), and
+    # PostgreSQL refuses the new partition while they are there: move them across
+    columns = 'id, action, notes, timestamp, document_id, user_id'
+    cursor.execute(f'ALTER TABLE {LOG_TABLE} DETACH PARTITION {DEFAULT_PARTITION}')
+    cursor.execute(f'CREATE TABLE {name} PARTITION OF {LOG_TABLE} {bounds}')
+    cursor.execute(
+        f'INSERT INTO {name} ({columns}) SELECT {columns} FROM {DEFAULT_PARTITION} '
+        f'WHERE timestamp >= %s AND timestamp < %s', [start, end])
+    cursor.execute(f'DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= %s AND timestamp < %s', [start, end])
+    cursor.execute(f'ALTER TABLE {LOG_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT')
+
+
+def ensure_log_partitions(connection, months_ahead=3, since=None):
+    if connection.vendor != 'postgresql':
+        return []
+    today = timezone.now().date()
+    start = _month_start(since or today)
+    last = _month_start(today, months_ahead)
+    created = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        while start <= last:
+            end = _month_start(start, 1)
+            name = _partition_name(start)
+            cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [name])
+            if not cursor.fetchone()[0]:
+                _create_partition(cursor, name, start, end)
+            created.append(name)
+            start = end
+    return created
@@ -0,0 +1,65 @@
+# queries.py
+def search_filtered(docs, data, limit=500):
+    """
+    ``docs`` narrowed by DocumentSearchForm's cleaned ``data``. Returns
+    ``(docs, hits)``: ``hits`` is the relevance-ranked list of matching ids
+    in ``docs`` (at most ``limit``) when the full-text backend answered the
+    query, else None.
+    """
+    from django.db.models import Q
+
+    from .search import get_backend
+
+    if data.get('status'):
+        docs = docs.filter(status=data['status'])
+    if data.get('source'):
+        docs = docs.filter(source=data['source'])
+    q = data.get('query')
+    hits = None
+    if q:
+        # Ranked inside ``docs``, so the limit never drops hits the user may see
+        hits = get_backend().search(q, limit=limit, within=docs)
+        if hits is None:
+            docs = docs.filter(Q(title__icontains=q) | Q(reference_number__icontains=q))
+        else:
+            docs = docs.filter(pk__in=hits)
+    return docs, hits
+
+
+# ─── QUERY PLAN CHECKS ────────────────────────────────────────────────────────
+# The hot queries behind the visibility-scoped listings, checked by the
+# check_query_plans command so an index regression fails CI.
+
+def hot_queries(sender, head):
+    """(name, queryset) pairs for a sender/receiver user and a department head."""
+    from .models import Document, DocumentLog, DocumentRouting, Notification, User
+
+    own = Document.objects.visible_to(sender)
+    dept = Document.objects.visible_to(head)
+    return [
+        ('list: all documents, first page', Document.objects.order_by('-created_at', '-id')[:26]),
+        ('list: sender scope', own.order_by('-created_at', '-id')[:26]),
+        ('list: sender scope by status', own.filter(status='pending_review').order_by('-created_at', '-id')[:26]),
+        ('list: department scope', dept.order_by('-created_at', '-id')[:26]),
+        ('list: status filter', Document.objects.filter(status='pending_review').order_by('-created_at')[:26]),
+        ('dashboard: recent', dept.order_by('-updated_at')[:5]),
+        ('dashboard: created by', Document.objects.filter(created_by=sender, status='approved')),
+        ('detail: visibility check', own.filter(pk=1)),
+        ('detail: logs', DocumentLog.objects.filter(document_id=1).order_by('-timestamp')),
+        ('detail: routings', DocumentRouting.objects.filter(document_id=1).order_by('forwarded_at')),
+        ('notify: department heads', User.objects.filter(department=head.department, role='dept_head')),
+        ('inbox: page', Notification.objects.filter(recipient=sender).order_by('-created_at', '-id')[:26]),
+        ('badge: unread', Notification.objects.filter(recipient=sender, is_read=False)),
+    ]
+
+
+def full_scans(queryset, connection):
+    """The lines of ``queryset``'s plan that read a whole table."""
+    plan = queryset.explain()
+    if connection.vendor == 'postgresql':
+        return [line.strip() for line in plan.splitlines() if 'Seq Scan' in line]
+    if connection.vendor == 'sqlite':
+        # "SCAN t USING [COVERING] INDEX i" walks an index in order; a bare "SCAN t" reads the table
+        return [line.strip() for line in plan.splitlines()
+                if ' SCAN ' in f' {line} ' and 'USING' not in line and 'SUBQUERY' not in line]
+    return []
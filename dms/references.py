@@ -0,0 +1,59 @@
+# references.py
+import re
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.timezone import now
+
+from .models import Document, ReferenceSequence
+
+
+def reference_prefix(year, scope=''):
+    return f"DOC-{scope}-{year}-" if scope else f"DOC-{year}-"
+
+
+def format_reference(year, value, scope=''):
+    return f"{reference_prefix(year, scope)}{value:05d}"
+
+
+def _highest_issued(prefix):
+    # Only runs when a sequence row is first created, so numbering continues past legacy rows
+    pattern = re.compile(re.escape(prefix) + r'(\d+)$')
+    highest = 0
+    for ref in Document.objects.filter(reference_number__startswith=prefix).values_list('reference_number', flat=True).iterator():
+        match = pattern.match(ref)
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest
+
+
+def reserve_reference_numbers(count, year=None, department=None):
+    """
+    Atomically reserve ``count`` consecutive reference numbers and return them.
+
+    The UPDATE takes the row (PostgreSQL) or database (SQLite) write lock
+    before the new value is read back, so concurrent workers never see the
+    same block. Numbering is per department when DMS_REFERENCE_PER_DEPARTMENT
+    is set.
+    """
+    if count < 1:
+        return []
+    year = year or now().year
+    scope = ''
+    if department is not None and getattr(settings, 'DMS_REFERENCE_PER_DEPARTMENT', False):
+        scope = department.code
+    rows = ReferenceSequence.objects.filter(year=year, scope=scope)
+
+    with transaction.atomic():
+        if not rows.update(last_value=F('last_value') + count):
+            try:
+                with transaction.atomic():
+                    seed = _highest_issued(reference_prefix(year, scope))
+                    ReferenceSequence.objects.create(year=year, scope=scope, last_value=seed + count)
+            except IntegrityError:
+                # Another worker created the row first
+                rows.update(last_value=F('last_value') + count)
+        last = rows.values_list('last_value', flat=True).get()
+
+    return [format_reference(year, value, scope) for value in range(last - count + 1, last + 1)]
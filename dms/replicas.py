@@ -0,0 +1,147 @@
+# replicas.py
+"""
+Read replicas for the read-mostly pages.
+
+ReplicaMiddleware marks GET/HEAD requests to the views in
+DMS_REPLICA_VIEWS, and for those ReplicaRouter sends reads to one of the
+DMS_READ_REPLICAS aliases (picked once per request). Everything else
+reads from 'default', and so does a marked request once it has written
+anything, inside a transaction on 'default', or when it reads sessions
+(a fresh login may not have replicated yet). Session saves and the
+last_login stamp are bookkeeping and don't count as writes for that.
+
+Replication lag is bounded by DMS_REPLICA_LAG_SECONDS: a user who wrote
+gets a short-lived cookie that keeps their next requests on the primary,
+and dms.pagecache rebuilds entries invalidated within that window from
+the primary, so a lagging replica never gets cached under a fresh
+version. A replica that refuses connections is skipped for
+REPLICA_RETRY_SECONDS.
+"""
+import random
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+PIN_COOKIE = 'dms_primary'
+REPLICA_RETRY_SECONDS = 30
+DEFAULT_VIEWS = ('dashboard', 'document_list', 'document_detail', 'notifications_count')
+
+_state = ContextVar('dms_replica_state', default=None)
+_down_until = {}
+
+
+class RequestState:
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+        self.bookkeeping = False
+
+
+def replica_aliases():
+    return [alias for alias in getattr(settings, 'DMS_READ_REPLICAS', ()) if alias in settings.DATABASES]
+
+
+def lag_seconds():
+    return getattr(settings, 'DMS_REPLICA_LAG_SECONDS', 10)
+
+
+def _available(alias):
+    if _down_until.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        _down_until[alias] = time.monotonic() + REPLICA_RETRY_SECONDS
+        return False
+    return True
+
+
+def choose_replica():
+    """A reachable replica alias, or None to stay on the primary."""
+    aliases = replica_aliases()
+    random.shuffle(aliases)
+    return next((alias for alias in aliases if _available(alias)), None)
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside this block."""
+    state = _state.get()
+    replica = state.replica if state else None
+    if state:
+        state.replica = None
+    try:
+        yield
+    finally:
+        if state and not state.wrote:
+            state.replica = replica
+
+
+@contextmanager
+def bookkeeping():
+    """Writes inside this block don't pin the request (or the client) to the primary."""
+    state = _state.get()
+    if state is None or state.bookkeeping:
+        yield
+        return
+    state.bookkeeping = True
+    try:
+        yield
+    finally:
+        state.bookkeeping = False
+
+
+def read_after(version_ns):
+    """Read from the primary if a write at ``version_ns`` (time.time_ns()) may not have replicated yet."""
+    if time.time_ns() - version_ns < lag_seconds() * 1_000_000_000:
+        return primary()
+    return nullcontext()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.replica is None or model._meta.app_label == 'sessions':
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        # Sessions are read from the primary anyway (see db_for_read)
+        if state is not None and not state.bookkeeping and model._meta.app_label != 'sessions':
+            # Read-after-write: the rest of this request reads what it wrote
+            state.wrote = True
+            state.replica = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.views = set(getattr(settings, 'DMS_REPLICA_VIEWS', DEFAULT_VIEWS))
+
+    def __call__(self, request):
+        state = RequestState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            response.set_cookie(PIN_COOKIE, '1', max_age=lag_seconds(), httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if (state is not None and not state.wrote and request.method in ('GET', 'HEAD')
+                and request.resolver_match.url_name in self.views and PIN_COOKIE not in request.COOKIES):
+            state.replica = choose_replica()
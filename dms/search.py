@@ -0,0 +1,161 @@
+# search.py
+"""
+Full-text search over documents.
+
+Each backend keeps a side index keyed by document id (an FTS5 table on
+SQLite, a GIN-indexed tsvector table on PostgreSQL) in step with Document
+writes via dms.signals, and answers queries with relevance-ranked ids.
+Besides the document's own fields it indexes the attachment text that
+dms.extraction stores, at a low weight.
+"""
+import os
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+SEARCH_FIELDS = ('title', 'reference_number', 'description', 'correspondent_name', 'correspondent_agency')
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def document_contents(docs):
+    """{doc.pk: extracted text of its attachment} (see dms.extraction), in one query."""
+    from .models import TextExtraction
+
+    digests = {doc.pk: os.path.basename(doc.file.name) for doc in docs if doc.file}
+    if not digests:
+        return {}
+    texts = dict(TextExtraction.objects.filter(blob_id__in=set(digests.values()), status='done')
+                 .values_list('blob_id', 'text'))
+    return {pk: texts.get(digest, '') for pk, digest in digests.items()}
+
+
+def _rows(docs):
+    contents = document_contents(docs)
+    return [[doc.pk] + [getattr(doc, f) or '' for f in SEARCH_FIELDS] + [contents.get(doc.pk, '')] for doc in docs]
+
+
+def _within(docs, column):
+    """An ``AND column IN (...)`` clause limiting hits to the Document queryset ``docs``."""
+    if docs is None:
+        return '', ()
+    sql, params = docs.order_by().values('pk').query.sql_with_params()
+    return f' AND {column} IN ({sql})', params
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())[:16]
+
+
+class BaseSearchBackend:
+    def index(self, doc):
+        self.index_many([doc])
+
+    def index_many(self, docs):
+        """(Re)index several documents with one statement per table."""
+        pass
+
+    def remove(self, doc_id):
+        pass
+
+    def search(self, query, limit=500, within=None):
+        """
+        Ranked document ids for ``query``, or None if this backend can't
+        search. ``within`` (a Document queryset) is applied before the
+        ranking and the limit, so narrow scopes still get ``limit`` hits.
+        """
+        return None
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    table = 'dms_document_fts'
+    # bm25 column weights, in SEARCH_FIELDS order, then the attachment text
+    weights = (10.0, 10.0, 1.0, 3.0, 3.0, 0.5)
+
+    def index_many(self, docs):
+        rows = _rows(docs)
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [[row[0]] for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, {", ".join(SEARCH_FIELDS)}, content) '
+                f'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                rows,
+            )
+
+    def remove(self, doc_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [doc_id])
+
+    def search(self, query, limit=500, within=None):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        match = ' '.join(f'"{t}"*' for t in tokens)
+        weights = ', '.join(str(w) for w in self.weights)
+        # '+rowid' keeps the IN list away from FTS5, which would otherwise run the MATCH once per listed id
+        scope, params = _within(within, '+rowid')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s{scope} '
+                f'ORDER BY bm25({self.table}, {weights}) LIMIT %s',
+                [match, *params, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresFTSBackend(BaseSearchBackend):
+    table = 'dms_document_search'
+    vector_sql = (
+        "setweight(to_tsvector('simple', coalesce(%s, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(%s, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(%s, '')), 'C') || "
+        "setweight(to_tsvector('simple', coalesce(%s, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(%s, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(%s, '')), 'D')"
+    )
+
+    def index_many(self, docs):
+        rows = _rows(docs)
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (document_id, vector) VALUES (%s, {self.vector_sql}) '
+                f'ON CONFLICT (document_id) DO UPDATE SET vector = EXCLUDED.vector',
+                rows,
+            )
+
+    def remove(self, doc_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE document_id = %s', [doc_id])
+
+    def search(self, query, limit=500, within=None):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        tsquery = ' & '.join(f'{t}:*' for t in tokens)
+        scope, params = _within(within, 'document_id')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT document_id FROM {self.table}, to_tsquery('simple', %s) q "
+                f'WHERE vector @@ q{scope} ORDER BY ts_rank(vector, q) DESC, document_id DESC LIMIT %s',
+                [tsquery, *params, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'postgresql': PostgresFTSBackend,
+}
+
+
+def get_backend():
+    path = getattr(settings, 'DMS_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    return BACKENDS.get(connection.vendor, BaseSearchBackend)()
+
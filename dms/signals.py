@@ -0,0 +1,163 @@
+# signals.py
+from django.contrib.auth.models import update_last_login
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import access, derivatives, extraction, pagecache, replicas, search, stats, unread
+from .storage import blob_storage
+from .models import Document, DocumentLog, DocumentRouting, Notification, NotificationCounter, User
+
+BLOB_FIELDS = ('file', 'esignature')
+
+
+def _stat_keys(doc):
+    return stats.document_scopes(*(getattr(doc, f) for f in stats.TRACKED_FIELDS))
+
+
+def _search_values(doc):
+    return tuple(getattr(doc, f) for f in search.SEARCH_FIELDS)
+
+
+def _blob_names(doc):
+    # Raw attribute values: going through the descriptors would build FieldFiles for every row
+    return {f: getattr(doc.__dict__.get(f), 'name', doc.__dict__.get(f)) for f in BLOB_FIELDS}
+
+
+def _release_blobs(names):
+    names = [n for n in names if n]
+    if names:
+        transaction.on_commit(lambda: [blob_storage.delete(n) for n in names])
+
+
+@receiver(post_init, sender=Document)
+def remember_stat_keys(sender, instance, **kwargs):
+    # Loading deferred fields here would cost a query per row; pre_save fills those in
+    if instance.pk and not instance.get_deferred_fields():
+        instance._stat_keys = _stat_keys(instance)
+        instance._search_values = _search_values(instance)
+        instance._blob_names = _blob_names(instance)
+    else:
+        instance._stat_keys = None
+        instance._search_values = None
+        instance._blob_names = None
+
+
+@receiver(pre_save, sender=Document)
+def load_stat_keys(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance._stat_keys is not None:
+        return
+    row = Document.objects.filter(pk=instance.pk).values(*stats.TRACKED_FIELDS).first()
+    instance._stat_keys = stats.document_scopes(**row) if row else set()
+
+
+@receiver(post_save, sender=Document)
+def update_document_keys(sender, instance, created, raw=False, **kwargs):
+    # One receiver, so the counters, the access rows and the page cache all see the same old keys
+    if raw:
+        return
+    old_keys = set() if created else (instance._stat_keys or set())
+    new_keys = _stat_keys(instance)
+    stats.apply_change(old_keys, new_keys)
+    access.apply_changes([(instance.pk, old_keys, new_keys)])
+    pagecache.invalidate(pagecache.document_scopes(old_keys | new_keys, instance.pk))
+    instance._stat_keys = new_keys
+
+
+@receiver(post_save, sender=Document)
+def update_search_index(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    values = _search_values(instance)
+    if created or values != instance._search_values:
+        search.get_backend().index(instance)
+        instance._search_values = values
+
+
+@receiver(post_delete, sender=Document)
+def drop_document_keys(sender, instance, **kwargs):
+    old_keys = instance._stat_keys or _stat_keys(instance)
+    stats.apply_change(old_keys, set())
+    pagecache.invalidate(pagecache.document_scopes(old_keys, instance.pk))
+
+
+@receiver(post_delete, sender=Document)
+def drop_search_entry(sender, instance, **kwargs):
+    search.get_backend().remove(instance.pk)
+
+
+@receiver(pre_delete, sender=Document)
+def release_unread_notifications(sender, instance, **kwargs):
+    # The cascade removes this document's notifications without signals
+    recipients = set(instance.notifications.filter(is_read=False).values_list('recipient_id', flat=True))
+    if recipients:
+        instance.notifications.filter(is_read=False).delete()
+        unread.recount(recipients)
+
+
+@receiver(post_save, sender=DocumentLog)
+@receiver(post_delete, sender=DocumentLog)
+@receiver(post_save, sender=DocumentRouting)
+@receiver(post_delete, sender=DocumentRouting)
+def invalidate_timeline(sender, instance, raw=False, **kwargs):
+    if not raw:
+        pagecache.invalidate([f'document:{instance.document_id}'])
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def invalidate_inbox(sender, instance, raw=False, **kwargs):
+    if not raw:
+        pagecache.invalidate([f'inbox:{instance.recipient_id}'])
+
+
+def record_last_login(sender, user, **kwargs):
+    with replicas.bookkeeping():
+        update_last_login(sender, user, **kwargs)
+
+
+# Replaces django.contrib.auth's receiver (same dispatch_uid) where it is connected
+if user_logged_in.disconnect(dispatch_uid='update_last_login'):
+    user_logged_in.connect(record_last_login, dispatch_uid='update_last_login')
+
+
+@receiver(post_save, sender=User)
+def create_notification_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        NotificationCounter.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Document)
+def queue_derivatives(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_names = _blob_names(instance)
+    old_names = instance._blob_names or {}
+    for field in BLOB_FIELDS:
+        if new_names[field] and new_names[field] != old_names.get(field):
+            derivatives.build(field, new_names[field])
+
+
+@receiver(post_save, sender=Document)
+def queue_text_extraction(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    name = _blob_names(instance)['file']
+    if name and name != (instance._blob_names or {}).get('file'):
+        extraction.queue(name)
+
+
+@receiver(post_save, sender=Document)
+def release_replaced_blobs(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_names = _blob_names(instance)
+    old_names = instance._blob_names or {}
+    _release_blobs(old_names[f] for f in BLOB_FIELDS if old_names.get(f) and old_names[f] != new_names[f])
+    instance._blob_names = new_names
+
+
+@receiver(post_delete, sender=Document)
+def release_document_blobs(sender, instance, **kwargs):
+    _release_blobs(_blob_names(instance).values())
@@ -0,0 +1,128 @@
+# stats.py
+from collections import Counter, defaultdict
+
+from django.db import DatabaseError, router, transaction
+from django.db.models import Count, F, Q
+
+from .models import Document, DocumentStat
+
+TRACKED_FIELDS = ('status', 'created_by_id', 'assigned_to_id', 'origin_department_id', 'current_department_id')
+
+
+def document_scopes(status, created_by_id, assigned_to_id, origin_department_id, current_department_id):
+    """The (scope, scope_id, status) counters a document with these values contributes to."""
+    keys = {('all', 0, status)}
+    for user_id in (created_by_id, assigned_to_id):
+        if user_id:
+            keys.add(('user', user_id, status))
+    for dept_id in (origin_department_id, current_department_id):
+        if dept_id:
+            keys.add(('department', dept_id, status))
+    return keys
+
+
+def _matching(keys):
+    q = Q()
+    for scope, scope_id, status in keys:
+        q |= Q(scope=scope, scope_id=scope_id, status=status)
+    return DocumentStat.objects.filter(q)
+
+
+def apply_change(old_keys, new_keys):
+    """Move one document's contribution from ``old_keys`` to ``new_keys``."""
+    removed, added = old_keys - new_keys, new_keys - old_keys
+    if removed:
+        _matching(removed).update(count=F('count') - 1)
+    if added:
+        # Make sure every target row exists (no-op for rows already there), then count this document
+        DocumentStat.objects.bulk_create(
+            [DocumentStat(scope=scope, scope_id=scope_id, status=status) for scope, scope_id, status in added],
+            ignore_conflicts=True,
+        )
+        _matching(added).update(count=F('count') + 1)
+
+
+def apply_changes(changes):
+    """Net out many documents' ``(old_keys, new_keys)`` moves: one UPDATE per distinct delta."""
+    deltas = Counter()
+    for old_keys, new_keys in changes:
+        deltas.update({key: -1 for key in old_keys - new_keys})
+        deltas.update({key: 1 for key in new_keys - old_keys})
+    by_delta = defaultdict(list)
+    for key, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(key)
+    added = [key for key, delta in deltas.items() if delta > 0]
+    if added:
+        DocumentStat.objects.bulk_create(
+            [DocumentStat(scope=scope, scope_id=scope_id, status=status) for scope, scope_id, status in added],
+            ignore_conflicts=True,
+        )
+    for delta, keys in by_delta.items():
+        _matching(keys).update(count=F('count') + delta)
+
+
+def scope_for_user(user):
+    """The (scope, scope_id) whose documents ``user`` may see; Document.objects.visible_to() uses it too."""
+    if user.role == 'dept_sender_receiver':
+        return 'user', user.pk
+    if user.role in ('dept_head', 'governor', 'executive') and user.department_id:
+        return 'department', user.department_id
+    return 'all', 0
+
+
+def read_counts(scope, scope_id):
+    """{status: count} for one scope in a single indexed lookup."""
+    return dict(DocumentStat.objects.filter(scope=scope, scope_id=scope_id).values_list('status', 'count'))
+
+
+def aggregate_counts(queryset):
+    """Fallback: every status count for ``queryset`` in one conditional-aggregation query."""
+    aggregates = {status: Count('id', filter=Q(status=status)) for status, _ in Document.STATUS_CHOICES}
+    return queryset.aggregate(**aggregates)
+
+
+def dashboard_counts(user, queryset):
+    """
+    {'total', 'pending', 'approved', 'archived'} for ``user``. Reads the
+    DocumentStat table, falling back to ``queryset`` if the table is missing.
+    """
+    try:
+        with transaction.atomic(using=router.db_for_read(DocumentStat)):
+            counts = read_counts(*scope_for_user(user))
+    except DatabaseError:
+        counts = aggregate_counts(queryset)
+    return {
+        'total': sum(counts.values()),
+        'pending': counts.get('pending_review', 0),
+        'approved': counts.get('approved', 0),
+        'archived': counts.get('archived', 0),
+    }
+
+
+def rebuild(document_model=Document, stat_model=DocumentStat):
+    """Recompute every counter from the documents table (also used by the migration)."""
+    totals = {}
+
+    def add(rows, scope):
+        for scope_id, status, n in rows:
+            if scope_id is not None:
+                key = (scope, scope_id, status)
+                totals[key] = totals.get(key, 0) + n
+
+    docs = document_model.objects.order_by()
+    add(((0, status, n) for status, n in docs.values_list('status').annotate(n=Count('id'))), 'all')
+    add(docs.values_list('created_by_id', 'status').annotate(n=Count('id')), 'user')
+    add(docs.exclude(assigned_to_id=F('created_by_id')).values_list('assigned_to_id', 'status')
+        .annotate(n=Count('id')), 'user')
+    add(docs.values_list('current_department_id', 'status').annotate(n=Count('id')), 'department')
+    add(docs.exclude(origin_department_id=F('current_department_id')).values_list('origin_department_id', 'status')
+        .annotate(n=Count('id')), 'department')
+
+    with transaction.atomic():
+        stat_model.objects.all().delete()
+        stat_model.objects.bulk_create(
+            stat_model(scope=scope, scope_id=scope_id, status=status, count=n)
+            for (scope, scope_id, status), n in totals.items()
+        )
+    return len(totals)
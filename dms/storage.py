@@ -0,0 +1,136 @@
+# storage.py
+"""
+Content-addressed storage for uploaded files.
+
+Uploads are streamed to a temporary file by HashingUploadHandler, which
+hashes each chunk as it is written. BlobStorage then files the upload
+under ``blobs/<sha256>``: identical content is kept once and later copies
+cost no disk writes. Blob counts references so a file is removed only when
+its last document lets go of it.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, TemporaryFileUploadHandler
+from django.db import transaction
+from django.db.models import F
+
+
+class SpooledUpload(TemporaryUploadedFile):
+    """A TemporaryUploadedFile kept in DMS_UPLOAD_TEMP_DIR, next to the blobs it will be renamed into."""
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        temp_dir = getattr(settings, 'DMS_UPLOAD_TEMP_DIR', None) or settings.FILE_UPLOAD_TEMP_DIR
+        if temp_dir:
+            os.makedirs(temp_dir, exist_ok=True)
+        file = tempfile.NamedTemporaryFile(suffix='.upload', dir=temp_dir)
+        UploadedFile.__init__(self, file, name, content_type, size, charset, content_type_extra)
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """Stream every upload to disk in chunks, computing its SHA-256 on the way."""
+
+    def new_file(self, *args, **kwargs):
+        FileUploadHandler.new_file(self, *args, **kwargs)
+        self.file = SpooledUpload(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        upload.sha256 = self.hasher.hexdigest()
+        return upload
+
+
+def content_hash(content):
+    digest = getattr(content, 'sha256', None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        hasher.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return hasher.hexdigest()
+
+
+def blob_name(digest):
+    return f'blobs/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def derivative_dir(digest):
+    """Where dms.derivatives keeps the renditions of blob ``digest``."""
+    return f'derivatives/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+class BlobStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Names are content hashes; the same name means the same bytes
+        return name
+
+    def _write(self, full_path, content):
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, partial = tempfile.mkstemp(suffix='.part', dir=directory)
+        try:
+            if hasattr(content, 'temporary_file_path'):
+                os.close(fd)
+                file_move_safe(content.temporary_file_path(), partial, allow_overwrite=True)
+            else:
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in content.chunks():
+                        f.write(chunk if isinstance(chunk, bytes) else chunk.encode())
+            if self.file_permissions_mode is not None:
+                os.chmod(partial, self.file_permissions_mode)
+            os.replace(partial, full_path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+
+    def _save(self, name, content):
+        from .models import Blob
+
+        digest = content_hash(content)
+        name = blob_name(digest)
+        full_path = self.path(name)
+        with transaction.atomic():
+            Blob.objects.bulk_create([Blob(sha256=digest, size=content.size, refcount=0)], ignore_conflicts=True)
+            # Taking the reference locks the row: a delete() of the last reference either finished before
+            # (its file is gone and is written again here) or waits until this transaction commits
+            Blob.objects.filter(sha256=digest).update(refcount=F('refcount') + 1)
+            if not os.path.exists(full_path):
+                self._write(full_path, content)
+        return name
+
+    def delete(self, name):
+        """Drop one reference to ``name``; the file goes with the last one."""
+        from .models import Blob
+
+        if not name:
+            return
+        digest = os.path.basename(name)
+        with transaction.atomic():
+            Blob.objects.filter(sha256=digest).update(refcount=F('refcount') - 1)
+            if Blob.objects.filter(sha256=digest, refcount__lte=0).delete()[0]:
+                # Unlink while the row is still locked, so no _save() can take a reference in between
+                super().delete(name)
+                shutil.rmtree(self.path(derivative_dir(digest)), ignore_errors=True)
+
+
+blob_storage = BlobStorage()
+
+
+def get_blob_storage():
+    return blob_storage
@@ -0,0 +1,75 @@
+from django.test import TestCase
+
+from dms import access, intake, stats, workflow
+from dms.models import Department, Document, DocumentAccess, DocumentStat, User
+
+
+def _stat_rows():
+    return set(DocumentStat.objects.filter(count__gt=0).values_list('scope', 'scope_id', 'status', 'count'))
+
+
+def _access_rows():
+    return set(DocumentAccess.objects.values_list('document_id', 'scope', 'scope_id'))
+
+
+class CounterConsistencyTests(TestCase):
+    """DocumentStat and DocumentAccess, kept up to date incrementally, match what rebuild() computes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.records = Department.objects.create(name='Records', code='REC')
+        cls.legal = Department.objects.create(name='Legal', code='LEG')
+        cls.head = User.objects.create_user('head', role='dept_head', department=cls.records)
+        cls.staff = User.objects.create_user('staff', role='dept_sender_receiver', department=cls.records)
+        cls.clerk = User.objects.create_user('clerk', role='dept_sender_receiver', department=cls.legal)
+
+    def assertMatchesRebuild(self):
+        incremental = _stat_rows(), _access_rows()
+        stats.rebuild()
+        access.rebuild()
+        self.assertEqual(incremental, (_stat_rows(), _access_rows()))
+
+    def document(self, status='draft', **fields):
+        fields = {'origin_department': self.records, 'current_department': self.records, **fields}
+        return Document.objects.create(title='Memo', source='internal', status=status, created_by=self.staff,
+                                       **fields)
+
+    def test_saves_and_deletes(self):
+        doc = self.document()
+        self.document('approved', origin_department=None, assigned_to=self.staff)
+        doc.status = 'pending_review'
+        doc.assigned_to = self.clerk
+        doc.current_department = self.legal
+        doc.save()
+        self.document('esigned').delete()
+        Document.objects.get(pk=doc.pk).delete()
+        self.assertMatchesRebuild()
+
+    def test_deferred_load_then_save(self):
+        doc = self.document()
+        deferred = Document.objects.only('title').get(pk=doc.pk)
+        deferred.status = 'approved'
+        deferred.save()
+        self.assertMatchesRebuild()
+
+    def test_workflow_steps(self):
+        docs = [self.document('esigned') for _ in range(3)]
+        workflow.perform(docs[0], 'route', self.head, to_department=self.legal)
+        workflow.perform_bulk(Document.objects.filter(pk__in=[d.pk for d in docs]), 'route', self.head,
+                              to_department=self.legal)
+        workflow.perform_bulk(Document.objects.filter(pk__in=[d.pk for d in docs]), 'assign', self.head,
+                              changes={'assigned_to': self.clerk})
+        self.assertMatchesRebuild()
+
+    def test_stale_bulk_copy(self):
+        doc = self.document('esigned')
+        stale = Document.objects.get(pk=doc.pk)
+        workflow.perform(doc, 'route', self.head, to_department=self.legal)
+        workflow.perform_bulk([stale], 'release_agency', self.head)
+        self.assertMatchesRebuild()
+
+    def test_manifest_import(self):
+        rows = [(1, {'title': 'Letter'}, None), (2, {'title': 'Invoice'}, None)]
+        intake.import_manifest(rows, self.staff)
+        self.assertEqual(Document.objects.count(), 2)
+        self.assertMatchesRebuild()
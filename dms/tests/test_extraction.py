@@ -0,0 +1,29 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from dms import extraction
+from dms.models import Blob, TextExtraction
+
+
+class ExtractionClaimTests(TestCase):
+    def setUp(self):
+        self.digest = 'a' * 64
+        Blob.objects.create(sha256=self.digest, size=1)
+
+    def test_only_one_claim_wins(self):
+        self.assertTrue(extraction._claim(self.digest))
+        self.assertFalse(extraction._claim(self.digest))
+        self.assertEqual(TextExtraction.objects.get(pk=self.digest).status, 'running')
+
+    @override_settings(DMS_EXTRACTION_WORKERS=0)
+    def test_run_pending_skips_claimed_jobs_until_they_go_stale(self):
+        extraction._claim(self.digest)
+        with mock.patch.object(extraction, 'extract', return_value='done') as extract:
+            extraction.run_pending()
+            extract.assert_not_called()
+            TextExtraction.objects.filter(pk=self.digest).update(started_at=timezone.now() - timedelta(hours=2))
+            extraction.run_pending()
+            extract.assert_called_once_with(self.digest)
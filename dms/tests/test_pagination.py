@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from dms.models import Department, Document
+from dms.pagination import InvalidCursor, KeysetPaginator, decode_cursor, encode_cursor
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='Records', code='REC')
+        docs = [Document.objects.create(title=f'Doc {i}', source='internal', current_department=department)
+                for i in range(7)]
+        # Three documents share a timestamp, so pages must break ties on id
+        start = timezone.now() - timedelta(days=1)
+        for i, doc in enumerate(docs):
+            Document.objects.filter(pk=doc.pk).update(created_at=start + timedelta(minutes=min(i, 4)))
+        cls.expected = list(Document.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def paginator(self, per_page=3):
+        return KeysetPaginator(Document.objects.all(), per_page=per_page)
+
+    def test_forward_walk_covers_every_row_once(self):
+        seen, after = [], None
+        while True:
+            page = self.paginator().page(after=after)
+            seen += [doc.pk for doc in page]
+            if not page.has_next:
+                break
+            after = page.next_cursor
+        self.assertEqual(seen, self.expected)
+
+    def test_first_and_last_page_links(self):
+        first = self.paginator().page()
+        self.assertFalse(first.has_previous)
+        self.assertTrue(first.has_next)
+        last = self.paginator(per_page=7).page()
+        self.assertEqual(len(last), 7)
+        self.assertFalse(last.has_next)
+
+    def test_exact_multiple_has_no_empty_trailing_page(self):
+        page = self.paginator(per_page=7).page()
+        self.assertIsNone(page.next_cursor)
+        second = self.paginator(per_page=4).page(after=self.paginator(per_page=4).page().next_cursor)
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next)
+
+    def test_backwards_returns_previous_page_in_order(self):
+        first = self.paginator().page()
+        second = self.paginator().page(after=first.next_cursor)
+        back = self.paginator().page(before=second.prev_cursor)
+        self.assertEqual([doc.pk for doc in back], [doc.pk for doc in first])
+        self.assertFalse(back.has_previous)
+
+    def test_cursor_roundtrip_and_garbage(self):
+        now = timezone.now()
+        self.assertEqual(decode_cursor(encode_cursor(now, 42)), (now, 42))
+        for token in ('not-a-cursor', '', '!!!'):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(token)
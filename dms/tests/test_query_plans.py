@@ -0,0 +1,13 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        try:
+            call_command('check_query_plans', documents=500, stdout=out)
+        except CommandError as exc:
+            self.fail(f'{exc}\n{out.getvalue()}')
@@ -0,0 +1,36 @@
+from django.test import TestCase, override_settings
+
+from dms.models import Department, Document, ReferenceSequence
+from dms.references import format_reference, reserve_reference_numbers
+
+
+class ReferenceAllocatorTests(TestCase):
+    def test_blocks_are_consecutive_and_disjoint(self):
+        first = reserve_reference_numbers(3, year=2030)
+        second = reserve_reference_numbers(2, year=2030)
+        self.assertEqual(first, ['DOC-2030-00001', 'DOC-2030-00002', 'DOC-2030-00003'])
+        self.assertEqual(second, ['DOC-2030-00004', 'DOC-2030-00005'])
+        self.assertEqual(ReferenceSequence.objects.get(year=2030, scope='').last_value, 5)
+
+    def test_zero_reserves_nothing(self):
+        self.assertEqual(reserve_reference_numbers(0, year=2030), [])
+        self.assertFalse(ReferenceSequence.objects.exists())
+
+    def test_new_sequence_continues_after_legacy_numbers(self):
+        Document.objects.create(title='Legacy', source='internal', reference_number=format_reference(2031, 41))
+        Document.objects.create(title='Other', source='internal', reference_number='DOC-2031-00007-A')
+        self.assertEqual(reserve_reference_numbers(1, year=2031), ['DOC-2031-00042'])
+
+    def test_years_number_separately(self):
+        self.assertEqual(reserve_reference_numbers(1, year=2030), ['DOC-2030-00001'])
+        self.assertEqual(reserve_reference_numbers(1, year=2031), ['DOC-2031-00001'])
+
+    @override_settings(DMS_REFERENCE_PER_DEPARTMENT=True)
+    def test_per_department_numbering(self):
+        legal = Department.objects.create(name='Legal', code='LEG')
+        self.assertEqual(reserve_reference_numbers(1, year=2030, department=legal), ['DOC-LEG-2030-00001'])
+        self.assertEqual(reserve_reference_numbers(1, year=2030), ['DOC-2030-00001'])
+
+    def test_documents_get_a_reference_on_save(self):
+        doc = Document.objects.create(title='Memo', source='internal')
+        self.assertRegex(doc.reference_number, r'^DOC-\d{4}-\d{5}$')
@@ -0,0 +1,76 @@
+from django.test import TestCase
+
+from dms import workflow
+from dms.models import Department, Document, DocumentLog, DocumentRouting, Notification, User
+
+
+class WorkflowTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.records = Department.objects.create(name='Records', code='REC')
+        cls.legal = Department.objects.create(name='Legal', code='LEG')
+        cls.head = User.objects.create_user('head', role='dept_head', department=cls.records)
+        cls.legal_head = User.objects.create_user('legal-head', role='dept_head', department=cls.legal)
+        cls.staff = User.objects.create_user('staff', role='dept_sender_receiver', department=cls.records)
+
+    def document(self, status='draft', **fields):
+        return Document.objects.create(title='Memo', source='internal', status=status, created_by=self.staff,
+                                       origin_department=self.records, current_department=self.records, **fields)
+
+    def test_assign_moves_to_review_and_notifies_assignee(self):
+        doc = self.document()
+        workflow.perform(doc, 'assign', self.head, changes={'assigned_to': self.staff})
+        doc.refresh_from_db()
+        self.assertEqual(doc.status, 'pending_review')
+        self.assertEqual(doc.assigned_to, self.staff)
+        self.assertEqual(list(doc.logs.values_list('action', flat=True)), ['assigned'])
+        self.assertTrue(Notification.objects.filter(recipient=self.staff, document=doc).exists())
+
+    def test_illegal_transition_writes_nothing(self):
+        doc = self.document()
+        with self.assertRaises(workflow.InvalidTransition):
+            workflow.perform(doc, 'route', self.head, to_department=self.legal)
+        doc.refresh_from_db()
+        self.assertEqual(doc.status, 'draft')
+        self.assertFalse(DocumentLog.objects.filter(document=doc).exists())
+
+    def test_route_records_routing_and_notifies_new_office(self):
+        doc = self.document('esigned')
+        workflow.perform(doc, 'route', self.head, notes='for review', to_department=self.legal)
+        doc.refresh_from_db()
+        self.assertEqual((doc.status, doc.current_department), ('pending_review', self.legal))
+        routing = DocumentRouting.objects.get(document=doc)
+        self.assertEqual((routing.from_department, routing.to_department), (self.records, self.legal))
+        self.assertEqual(list(Notification.objects.filter(document=doc).values_list('recipient', flat=True)),
+                         [self.legal_head.pk])
+
+    def test_stale_copy_cannot_repeat_a_step(self):
+        doc = self.document('esigned')
+        first, second = Document.objects.get(pk=doc.pk), Document.objects.get(pk=doc.pk)
+        workflow.perform(first, 'route', self.head, to_department=self.legal)
+        with self.assertRaises(workflow.InvalidTransition):
+            workflow.perform(second, 'route', self.head, to_department=self.legal)
+        self.assertEqual(DocumentRouting.objects.filter(document=doc).count(), 1)
+        self.assertEqual(DocumentLog.objects.filter(document=doc, action='routed').count(), 1)
+
+    def test_bulk_skips_illegal_and_stale_documents(self):
+        ready = [self.document('esigned') for _ in range(3)]
+        draft = self.document()
+        stale = Document.objects.get(pk=ready[0].pk)
+        workflow.perform(ready[0], 'route', self.head, to_department=self.legal)
+
+        result = workflow.perform_bulk([stale, Document.objects.get(pk=ready[1].pk),
+                                        Document.objects.get(pk=ready[2].pk), draft],
+                                       'route', self.head, to_department=self.legal)
+        self.assertEqual([doc.pk for doc in result.done], [ready[1].pk, ready[2].pk])
+        self.assertEqual(set(result.failed), {ready[0].pk, draft.pk})
+        self.assertEqual(DocumentRouting.objects.filter(document=ready[0]).count(), 1)
+        self.assertEqual(Notification.objects.filter(recipient=self.legal_head).count(), 3)
+
+    def test_bulk_notify_archives_with_both_logs(self):
+        docs = [self.document('released') for _ in range(2)]
+        result = workflow.perform_bulk(Document.objects.filter(pk__in=[d.pk for d in docs]), 'notify', self.head)
+        self.assertEqual(len(result.done), 2)
+        self.assertEqual(set(Document.objects.filter(pk__in=[d.pk for d in docs]).values_list('status', flat=True)),
+                         {'archived'})
+        self.assertEqual(DocumentLog.objects.filter(document__in=docs).count(), 4)
@@ -0,0 +1,92 @@
+# textextract.py
+"""
+Plain-text extraction for dms.extraction, run in worker processes.
+
+Like dms.imaging this module does not touch Django. extract() sniffs the
+file's leading bytes rather than trusting a name: PDFs go through
+poppler's pdftotext, DOCX through the standard library's zipfile and XML
+parser, and anything that decodes as text is read as is.
+"""
+import codecs
+import subprocess
+import zipfile
+from xml.etree import ElementTree
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+DOCX_XML_LIMIT = 256 * 1024 * 1024
+
+
+class Unsupported(Exception):
+    pass
+
+
+def _pdf(path, pdftotext):
+    if not pdftotext:
+        raise Unsupported('PDF extraction is disabled (DMS_PDFTOTEXT)')
+    try:
+        result = subprocess.run([pdftotext, '-q', '-enc', 'UTF-8', path, '-'], capture_output=True, timeout=300)
+    except FileNotFoundError:
+        raise Unsupported(f'{pdftotext} is not installed')
+    if result.returncode != 0:
+        raise ValueError(result.stderr.decode(errors='replace').strip() or f'pdftotext exited {result.returncode}')
+    return result.stdout.decode('utf-8', errors='replace')
+
+
+def _docx(path, max_chars=None):
+    with zipfile.ZipFile(path) as archive:
+        try:
+            info = archive.getinfo('word/document.xml')
+        except KeyError:
+            raise Unsupported('ZIP archive without word/document.xml')
+        # zipfile never inflates past the declared size, so this bounds the work on a zip bomb
+        if info.file_size > DOCX_XML_LIMIT:
+            raise Unsupported(f'word/document.xml is larger than {DOCX_XML_LIMIT} bytes')
+        paragraphs, length = [], 0
+        with archive.open(info) as xml:
+            # Streamed, and stopped once there is text enough, so memory stays bounded too
+            for _, element in ElementTree.iterparse(xml):
+                if element.tag == f'{WORD_NS}p':
+                    text = ''.join(node.text or '' for node in element.iter(f'{WORD_NS}t'))
+                    paragraphs.append(text)
+                    length += len(text) + 1
+                    element.clear()
+                    if max_chars and length >= max_chars * 2:
+                        break
+    return '\n'.join(paragraphs)
+
+
+def _text(head, path, max_chars=None):
+    if b'\0' in head:
+        raise Unsupported('binary file')
+    with open(path, 'rb') as f:
+        # Four bytes covers any UTF-8 character, with room left for whitespace that gets collapsed
+        raw = f.read(max_chars * 4 if max_chars else -1)
+    try:
+        # Incremental, so a character cut in half at the read limit is dropped rather than an error
+        return codecs.getincrementaldecoder('utf-8-sig')().decode(raw)
+    except UnicodeDecodeError:
+        return raw.decode('latin-1')
+
+
+def extract(path, pdftotext='pdftotext', max_chars=None):
+    """
+    ('done', text, '') on success, ('unsupported', '', reason) for formats
+    we can't read, ('failed', '', error) if reading a supported one broke.
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(4096)
+        if head.startswith(b'%PDF-'):
+            text = _pdf(path, pdftotext)
+        elif head.startswith(b'PK\x03\x04'):
+            text = _docx(path, max_chars)
+        else:
+            text = _text(head, path, max_chars)
+    except Unsupported as exc:
+        return 'unsupported', '', str(exc)
+    except (OSError, ValueError, zipfile.BadZipFile, ElementTree.ParseError, subprocess.TimeoutExpired) as exc:
+        return 'failed', '', f'{type(exc).__name__}: {exc}'[:255]
+    text = ' '.join(text.split())
+    if max_chars:
+        text = text[:max_chars]
+    return 'done', text, ''
@@ -0,0 +1,154 @@
+# timeline.py
+"""
+A document's history as one list, newest first: its DocumentLog rows,
+its DocumentRouting rows and, for archived documents, the logs moved to
+the archive segments (see dms.logarchive).
+
+Live rows come from a single UNION ALL query that already carries the
+names the page shows (user, from/to office), so a page costs one query
+however many offices the document went through, plus one index lookup
+for archived documents. Pages hold ``size`` entries; the ``next_cursor``
+of a page is passed back as ``after`` to load the older ones.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import CharField, F, Q, Value
+
+from .logarchive import read_entry
+from .models import DocumentLog, DocumentRouting, User
+from .pagination import InvalidCursor, KeysetPage
+
+PAGE_SIZE = 50
+
+# Entries are ordered by (timestamp, kind, id), all descending
+LOG, ROUTING, ARCHIVED = 'log', 'routing', 'archived'
+
+_ACTION_LABELS = dict(DocumentLog.ACTION_CHOICES)
+_ROLE_LABELS = dict(User.ROLE_CHOICES)
+_COLUMNS = ('kind', 'entry_id', 'at', 'entry_action', 'entry_notes', 'actor_id', 'actor_username',
+            'actor_first_name', 'actor_last_name', 'actor_role', 'from_name', 'to_name')
+
+
+class TimelineEntry:
+    def __init__(self, kind, id, timestamp, action, notes='', user=None, user_id=None, username=None,
+                 from_department=None, to_department=None):
+        self.kind = kind
+        self.id = id
+        self.timestamp = timestamp
+        self.action = action
+        self.notes = notes
+        self.user = user
+        self.user_id = user_id
+        self.username = username
+        self.from_department = from_department
+        self.to_department = to_department
+
+    @property
+    def key(self):
+        return self.timestamp, self.kind, self.id
+
+    @property
+    def is_routing(self):
+        return self.kind == ROUTING
+
+    def get_action_display(self):
+        return _ACTION_LABELS.get(self.action, self.action)
+
+
+def encode_cursor(key):
+    timestamp, kind, pk = key
+    raw = f'{timestamp.isoformat()}|{kind}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        timestamp, kind, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        if kind not in (LOG, ROUTING, ARCHIVED):
+            raise ValueError(kind)
+        return datetime.fromisoformat(timestamp), kind, int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidCursor(token) from exc
+
+
+def _older_than(kind, cursor):
+    """Rows of ``kind`` that sort after ``cursor`` in (timestamp, kind, id) descending order."""
+    timestamp, cursor_kind, pk = cursor
+    if kind < cursor_kind:
+        return Q(at__lte=timestamp)
+    if kind == cursor_kind:
+        return Q(at__lt=timestamp) | Q(at=timestamp, entry_id__lt=pk)
+    return Q(at__lt=timestamp)
+
+
+def _logs(document):
+    return DocumentLog.objects.filter(document=document).order_by().annotate(
+        kind=Value(LOG, CharField()), entry_id=F('pk'), at=F('timestamp'),
+        entry_action=F('action'), entry_notes=F('notes'), actor_id=F('user_id'),
+        actor_username=F('user__username'), actor_first_name=F('user__first_name'),
+        actor_last_name=F('user__last_name'), actor_role=F('user__role'),
+        from_name=Value(None, CharField()), to_name=Value(None, CharField()),
+    )
+
+
+def _routings(document):
+    return DocumentRouting.objects.filter(document=document).order_by().annotate(
+        kind=Value(ROUTING, CharField()), entry_id=F('pk'), at=F('forwarded_at'),
+        entry_action=Value('routed', CharField()), entry_notes=F('notes'),
+        actor_id=F('forwarded_by_id'), actor_username=F('forwarded_by__username'),
+        actor_first_name=F('forwarded_by__first_name'), actor_last_name=F('forwarded_by__last_name'),
+        actor_role=F('forwarded_by__role'),
+        from_name=F('from_department__name'), to_name=F('to_department__name'),
+    )
+
+
+def _actor_name(username, first_name, last_name, role):
+    """Same text as User.__str__, from the joined columns."""
+    if username is None:
+        return None
+    name = f'{first_name} {last_name}'.strip() or username
+    return f'{name} ({_ROLE_LABELS.get(role, role)})'
+
+
+def _live_entries(document, cursor, limit):
+    branches = []
+    for kind, queryset in ((LOG, _logs(document)), (ROUTING, _routings(document))):
+        if cursor is not None:
+            queryset = queryset.filter(_older_than(kind, cursor))
+        branches.append(queryset.values_list(*_COLUMNS))
+    rows = branches[0].union(branches[1], all=True).order_by('-at', '-kind', '-entry_id')[:limit]
+    return [
+        TimelineEntry(kind, pk, at, action, notes, user=_actor_name(username, first, last, role),
+                      user_id=user_id, username=username, from_department=from_name, to_department=to_name)
+        for kind, pk, at, action, notes, user_id, username, first, last, role, from_name, to_name in rows
+    ]
+
+
+def _archived_entries(document):
+    """Archived logs, numbered oldest first so their ids stay put as cursors."""
+    logs = []
+    for entry in document.log_archive_entries.order_by('pk'):
+        logs.extend(read_entry(entry))
+    return [
+        TimelineEntry(ARCHIVED, position, log.timestamp, log.action, log.notes, user=log.user,
+                      user_id=log.user_id, username=log.username)
+        for position, log in enumerate(logs, start=1)
+    ]
+
+
+def page(document, after=None, size=PAGE_SIZE):
+    """Entries of ``document`` older than the ``after`` cursor (newest first when omitted)."""
+    cursor = decode_cursor(after) if after else None
+    entries = _live_entries(document, cursor, size + 1)
+    if document.status == 'archived':
+        # Only archived documents have logs in the segments
+        entries += [e for e in _archived_entries(document) if cursor is None or e.key < cursor]
+        entries.sort(key=lambda e: e.key, reverse=True)
+
+    has_more = len(entries) > size
+    entries = entries[:size]
+    next_cursor = encode_cursor(entries[-1].key) if has_more else None
+    return KeysetPage(entries, next_cursor, None)
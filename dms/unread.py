@@ -0,0 +1,77 @@
+# unread.py
+"""
+Per-user unread-notification counters.
+
+NotificationCounter is adjusted with atomic F() deltas in the same
+transaction as the Notification writes, and read through the cache so the
+badge endpoints usually skip the database. Cached counts are keyed by the
+user's 'inbox' page-cache version, which every change bumps, so a count
+read before a change can never be stored where later reads look. On a
+per-process cache (see pagecache.shared) counts are not cached at all.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+
+from . import pagecache, replicas
+from .models import Notification, NotificationCounter
+
+CACHE_TIMEOUT = 120
+
+
+def _invalidate(user_ids):
+    pagecache.invalidate(f'inbox:{pk}' for pk in user_ids)
+
+
+def recount(user_ids):
+    """Set the counters for ``user_ids`` from the notifications table."""
+    user_ids = list(user_ids)
+    counts = dict(Notification.objects.filter(recipient_id__in=user_ids, is_read=False)
+                  .order_by().values_list('recipient_id').annotate(n=Count('id')))
+    for pk in user_ids:
+        NotificationCounter.objects.update_or_create(user_id=pk, defaults={'unread': counts.get(pk, 0)})
+    _invalidate(user_ids)
+
+
+def add_unread(user_ids, delta=1):
+    """Apply ``delta`` to every counter in ``user_ids`` with one UPDATE."""
+    user_ids = list(user_ids)
+    if not user_ids or not delta:
+        return
+    updated = NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=F('unread') + delta)
+    if updated < len(user_ids):
+        # Counter rows missing (e.g. users created outside the ORM): seed them from the table
+        existing = set(NotificationCounter.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        recount(pk for pk in user_ids if pk not in existing)
+    _invalidate(user_ids)
+
+
+def mark_read(user, notifications):
+    """Mark ``notifications`` (a queryset of ``user``'s notifications) read and adjust the counter."""
+    with transaction.atomic():
+        changed = notifications.filter(is_read=False).update(is_read=True)
+        if changed:
+            add_unread([user.pk], -changed)
+    return changed
+
+
+def _read(user):
+    count = NotificationCounter.objects.filter(user_id=user.pk).values_list('unread', flat=True).first()
+    if count is None:
+        recount([user.pk])
+        count = NotificationCounter.objects.get(user_id=user.pk).unread
+    return count
+
+
+def unread_count(user):
+    if not pagecache.shared():
+        return _read(user)
+    version = pagecache.versions([f'inbox:{user.pk}'])[0]
+    key = f'dms:unread:{user.pk}:{version}'
+    count = cache.get(key)
+    if count is None:
+        # The version dates the last change, which a replica may not have yet (see dms.replicas)
+        with replicas.read_after(version):
+            count = _read(user)
+        cache.add(key, count, CACHE_TIMEOUT)
+    return count
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, metrics, views
 
 urlpatterns = [
     # Auth
@@ -12,7 +12,14 @@ urlpatterns = [
     # Documents
     path('documents/', views.document_list, name='document_list'),
     path('documents/create/', views.document_create, name='document_create'),
+    path('documents/import/', views.document_import, name='document_import'),
+    path('documents/export/<slug:kind>/', views.document_export, name='document_export'),
+    path('documents/bulk/', views.document_bulk_action, name='document_bulk_action'),
     path('documents/<int:pk>/', views.document_detail, name='document_detail'),
+    path('documents/<int:pk>/timeline/', views.document_timeline, name='document_timeline'),
+    path('documents/<int:pk>/file/', views.document_file, name='document_file'),
+    path('documents/<int:pk>/esignature/', views.document_esignature, name='document_esignature'),
+    path('documents/<int:pk>/preview/<str:kind>/', views.document_derivative, name='document_derivative'),
     path('documents/<int:pk>/classify/', views.document_classify, name='document_classify'),
     path('documents/<int:pk>/assign/', views.document_assign, name='document_assign'),
     path('documents/<int:pk>/process/', views.document_process, name='document_process'),
@@ -27,4 +34,14 @@ urlpatterns = [
     # Notifications
     path('notifications/', views.notifications_view, name='notifications'),
     path('notifications/count/', views.notifications_count, name='notifications_count'),
+    path('notifications/stream/', views.notifications_stream, name='notifications_stream'),
+    # JSON API
+    path('api/documents/', api.documents, name='api_documents'),
+    path('api/documents/<int:pk>/', api.document, name='api_document'),
+    path('api/documents/<int:pk>/logs/', api.document_logs, name='api_document_logs'),
+    path('api/documents/<int:pk>/routings/', api.document_routings, name='api_document_routings'),
+    path('api/documents/<int:pk>/timeline/', api.document_timeline, name='api_document_timeline'),
+    path('api/notifications/', api.notifications, name='api_notifications'),
+    # Monitoring
+    path('metrics/', metrics.metrics_view, name='metrics'),
 ]
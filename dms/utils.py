@@ -1,9 +1,70 @@
 # utils.py
-from .models import Notification, DocumentLog
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+
+from . import events, unread
+from .models import User, Notification, DocumentLog
+from .workers import background
+
+
+def _recipient_ids(recipients):
+    if isinstance(recipients, QuerySet):
+        return list(recipients.values_list('pk', flat=True))
+    return [getattr(r, 'pk', r) for r in recipients if r is not None]
+
+
+def _create_notifications(batches):
+    rows = []
+    for recipients, document, message in batches:
+        rows.extend(Notification(recipient_id=pk, document=document, message=message)
+                    for pk in dict.fromkeys(_recipient_ids(recipients)))
+    per_user = Counter(n.recipient_id for n in rows)
+    with transaction.atomic():
+        created = Notification.objects.bulk_create(rows)
+        by_delta = defaultdict(list)
+        for user_id, n in per_user.items():
+            by_delta[n].append(user_id)
+        for delta, user_ids in by_delta.items():
+            unread.add_unread(user_ids, delta)
+    if events.has_subscribers():
+        transaction.on_commit(lambda: events.publish_notifications(created))
+    return created
+
+
+def notify_batches(batches, defer=None):
+    """
+    Write several ``(recipients, document, message)`` fan-outs with a
+    single bulk INSERT. ``recipients`` is a User queryset, or users / ids.
+    With ``defer`` (default: DMS_DEFER_NOTIFICATIONS) the rows are written
+    by a background worker once the current transaction commits, so the
+    request doesn't wait on them.
+    """
+    if defer is None:
+        defer = getattr(settings, 'DMS_DEFER_NOTIFICATIONS', False)
+    if defer:
+        transaction.on_commit(lambda: background(_create_notifications, batches))
+        return []
+    return _create_notifications(batches)
+
+
+def notify_users(recipients, document, message, defer=None):
+    """Notify every user in ``recipients`` about ``document`` (see notify_batches)."""
+    return notify_batches([(recipients, document, message)], defer=defer)
+
+
+def notify_department(document, message, department, role=None, defer=None):
+    """Notify the members of ``department``, optionally only those with ``role``."""
+    users = User.objects.filter(department=department)
+    if role:
+        users = users.filter(role=role)
+    return notify_users(users, document, message, defer=defer)
 
 
 def notify_user(user, document, message):
-    Notification.objects.create(recipient=user, document=document, message=message)
+    notify_users([user], document, message, defer=False)
 
 
 def log_action(document, user, action, notes=''):
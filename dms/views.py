@@ -1,18 +1,33 @@
+import asyncio
+import json
+import zipfile
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.db.models import Q
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse, StreamingHttpResponse, HttpResponse
+from django.views.decorators.http import condition
+from django.conf import settings
+from asgiref.sync import sync_to_async
 from .models import User, Document, Department, DocumentRouting, DocumentLog, Notification
 from .forms import (
     UserRegistrationForm, LoginForm, DocumentCreateForm,
     DocumentClassifyForm, DocumentAssignForm, DocumentReviewForm,
-    DocumentRoutingForm, UserRoleForm, DocumentSearchForm
+    DocumentRoutingForm, UserRoleForm, DocumentSearchForm, DocumentBulkActionForm, DocumentImportForm
 )
+from . import derivatives, events, pagecache, timeline, workflow
 from .decorators import role_required
-from .utils import notify_user, log_action
+from .delivery import serve_file
+from .export import EXPORTS, FORMATS, SEARCH_LIMIT as EXPORT_SEARCH_LIMIT, export
+from .intake import import_manifest, read_manifest, zip_files
+from .pagination import KeysetPaginator, RankedPaginator, InvalidCursor, approximate_count
+from .queries import search_filtered
+from .stats import dashboard_counts
+from .storage import blob_storage
+from .unread import mark_read, unread_count
+from .utils import notify_department, log_action
 
 
 def index(request):
@@ -54,21 +69,17 @@ def register_view(request):
 @login_required
 def dashboard(request):
     user = request.user
-    docs = Document.objects.all()
-    if user.role == 'dept_sender_receiver':
-        docs = docs.filter(Q(created_by=user) | Q(assigned_to=user))
-    elif user.role in ('dept_head', 'governor', 'executive'):
-        if user.department:
-            docs = docs.filter(Q(current_department=user.department) | Q(origin_department=user.department))
-    unread_notifications = request.user.notifications.filter(is_read=False).count()
-    ctx = {
-        'total': docs.count(),
-        'pending': docs.filter(status='pending_review').count(),
-        'approved': docs.filter(status='approved').count(),
-        'archived': docs.filter(status='archived').count(),
-        'recent_docs': docs.order_by('-updated_at')[:5],
-        'unread_notifications': unread_notifications,
-    }
+
+    def summary():
+        docs = Document.objects.visible_to(user)
+        ctx = dashboard_counts(user, docs)
+        ctx.update({
+            'recent_docs': list(docs.order_by('-updated_at')[:5]),
+            'unread_notifications': unread_count(user),
+        })
+        return ctx
+
+    ctx = pagecache.cached('dashboard', pagecache.dashboard_scopes(user), summary, user.pk)
     return render(request, 'dashboard.html', ctx)
 
 
@@ -77,27 +88,38 @@ def dashboard(request):
 @login_required
 def document_list(request):
     form = DocumentSearchForm(request.GET or None)
-    docs = Document.objects.all().order_by('-created_at')
     user = request.user
+    docs = Document.objects.visible_to(user).select_related('current_department', 'origin_department', 'created_by')
 
-    if user.role == 'dept_sender_receiver':
-        docs = docs.filter(Q(created_by=user) | Q(assigned_to=user))
-    elif user.role in ('dept_head',):
-        if user.department:
-            docs = docs.filter(Q(current_department=user.department) | Q(origin_department=user.department))
-
+    hits = None
     if form.is_valid():
-        q = form.cleaned_data.get('query')
-        status = form.cleaned_data.get('status')
-        source = form.cleaned_data.get('source')
-        if q:
-            docs = docs.filter(Q(title__icontains=q) | Q(reference_number__icontains=q))
-        if status:
-            docs = docs.filter(status=status)
-        if source:
-            docs = docs.filter(source=source)
-
-    return render(request, 'documents/list.html', {'docs': docs, 'form': form})
+        docs, hits = search_filtered(docs, form.cleaned_data)
+
+    if hits is None:
+        paginator = KeysetPaginator(docs, per_page=25)
+    else:
+        paginator = RankedPaginator(hits, docs, per_page=25)
+    if not request.GET:
+        # The unfiltered first page is what almost every visit opens
+        page = pagecache.cached('document_list', pagecache.visible_scopes(user), paginator.page)
+    else:
+        try:
+            page = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+        except InvalidCursor:
+            page = paginator.page()
+
+    ctx = {'docs': page, 'form': form}
+    if user.role in ('super_admin', 'dept_head') or user.is_superuser:
+        ctx['bulk_form'] = DocumentBulkActionForm()
+    if request.GET.get('total') == '1':
+        ctx['total'], ctx['total_capped'] = approximate_count(docs)
+
+    # Carry the search filters over into the next/prev links
+    params = request.GET.copy()
+    for key in ('after', 'before'):
+        params.pop(key, None)
+    ctx['filter_query'] = params.urlencode()
+    return render(request, 'documents/list.html', ctx)
 
 
 @login_required
@@ -121,35 +143,99 @@ def document_create(request):
         if doc.source == 'external':
             log_action(doc, request.user, 'logged')
             # Notify dept head
-            dept_heads = User.objects.filter(role='dept_head', department=request.user.department)
-            for dh in dept_heads:
-                notify_user(dh, doc, f"New external document received: {doc.reference_number}")
+            notify_department(doc, f"New external document received: {doc.reference_number}",
+                              request.user.department, role='dept_head')
 
         messages.success(request, f'Document {doc.reference_number} created successfully.')
         return redirect('document_detail', pk=doc.pk)
     return render(request, 'documents/create.html', {'form': form})
 
 
+@login_required
+@role_required(['super_admin', 'dept_head', 'dept_sender_receiver'])
+def document_import(request):
+    form = DocumentImportForm(request.POST or None, request.FILES or None)
+    result = None
+    if request.method == 'POST' and form.is_valid():
+        manifest = form.cleaned_data['manifest']
+        attachments = form.cleaned_data.get('attachments')
+        archive = zipfile.ZipFile(attachments) if attachments else None
+        try:
+            result = import_manifest(read_manifest(manifest, name=manifest.name), request.user,
+                                     open_file=zip_files(archive) if archive else None)
+        finally:
+            if archive:
+                archive.close()
+        if result.created:
+            messages.success(request, f'Imported {result.created} documents.')
+    return render(request, 'documents/import.html', {'form': form, 'result': result})
+
+
 @login_required
 def document_detail(request, pk):
-    doc = get_object_or_404(Document, pk=pk)
-    logs = doc.logs.all()
-    routings = doc.routings.all()
-    return render(request, 'documents/detail.html', {'doc': doc, 'logs': logs, 'routings': routings})
+    doc = get_object_or_404(Document.objects.visible_to(request.user).select_related(
+        'created_by', 'assigned_to', 'origin_department', 'current_department'), pk=pk)
+    entries = pagecache.cached('timeline', [f'document:{doc.pk}'], lambda: timeline.page(doc))
+    return render(request, 'documents/detail.html', {
+        'doc': doc, 'timeline': entries, 'derivatives': derivatives.for_document(doc),
+    })
+
+
+@login_required
+def document_timeline(request, pk):
+    """Older timeline entries for the detail page's "Load older" link."""
+    doc = get_object_or_404(Document.objects.visible_to(request.user).only('pk', 'status'), pk=pk)
+    try:
+        entries = timeline.page(doc, after=request.GET.get('after'))
+    except InvalidCursor:
+        raise Http404('Invalid cursor.')
+    return render(request, 'documents/timeline.html', {'doc': doc, 'timeline': entries})
+
+
+@login_required
+def document_file(request, pk):
+    doc = get_object_or_404(Document.objects.visible_to(request.user).only('pk', 'file', 'file_name'), pk=pk)
+    if not doc.file:
+        raise Http404('This document has no attachment.')
+    return serve_file(request, doc.file.storage, doc.file.name, filename=doc.file_name or None,
+                      as_attachment=request.GET.get('inline') != '1')
+
+
+@login_required
+def document_esignature(request, pk):
+    doc = get_object_or_404(Document.objects.visible_to(request.user).only('pk', 'esignature'), pk=pk)
+    if not doc.esignature:
+        raise Http404('This document has not been signed.')
+    return serve_file(request, doc.esignature.storage, doc.esignature.name, as_attachment=False)
+
+
+@login_required
+def document_derivative(request, pk, kind):
+    doc = get_object_or_404(Document.objects.visible_to(request.user).only('pk', 'file', 'esignature'), pk=pk)
+    derivative = derivatives.for_document(doc).get(kind)
+    if derivative is None:
+        raise Http404('No such preview.')
+    return serve_file(request, blob_storage, derivative.name, as_attachment=False)
+
+
+def _transition(request, doc, action, **kwargs):
+    """Run a workflow step, turning an illegal one into an error message."""
+    try:
+        workflow.perform(doc, action, request.user, **kwargs)
+    except workflow.InvalidTransition as exc:
+        messages.error(request, str(exc))
+        return False
+    return True
 
 
 @login_required
 @role_required(['super_admin', 'dept_head'])
 def document_classify(request, pk):
-    doc = get_object_or_404(Document, pk=pk)
+    doc = get_object_or_404(Document.objects.visible_to(request.user), pk=pk)
     form = DocumentClassifyForm(request.POST or None, instance=doc)
     if request.method == 'POST' and form.is_valid():
-        form.save()
-        log_action(doc, request.user, 'classified')
-        # Notify dept head to assign
-        dept_heads = User.objects.filter(role='dept_head', department=doc.current_department)
-        for dh in dept_heads:
-            notify_user(dh, doc, f"Document classified, please assign: {doc.reference_number}")
+        if not _transition(request, doc, 'classify', changes={'classification': form.cleaned_data['classification']}):
+            return redirect('document_detail', pk=doc.pk)
         messages.success(request, 'Document classified.')
         return redirect('document_assign', pk=doc.pk)
     return render(request, 'documents/classify.html', {'form': form, 'doc': doc})
@@ -158,33 +244,23 @@ def document_classify(request, pk):
 @login_required
 @role_required(['super_admin', 'dept_head'])
 def document_assign(request, pk):
-    doc = get_object_or_404(Document, pk=pk)
+    doc = get_object_or_404(Document.objects.visible_to(request.user), pk=pk)
     form = DocumentAssignForm(request.POST or None, instance=doc)
     if request.method == 'POST' and form.is_valid():
-        doc = form.save(commit=False)
-        doc.status = 'pending_review'
-        doc.save()
-        log_action(doc, request.user, 'assigned')
-        notify_user(doc.assigned_to, doc, f"You have been assigned document: {doc.reference_number}")
-        messages.success(request, 'Document assigned to action officer.')
+        if _transition(request, doc, 'assign', changes={'assigned_to': form.cleaned_data['assigned_to']}):
+            messages.success(request, 'Document assigned to action officer.')
         return redirect('document_detail', pk=doc.pk)
     return render(request, 'documents/assign.html', {'form': form, 'doc': doc})
 
 
 @login_required
 def document_process(request, pk):
-    doc = get_object_or_404(Document, pk=pk)
+    doc = get_object_or_404(Document.objects.visible_to(request.user), pk=pk)
     if request.method == 'POST':
         notes = request.POST.get('notes', '')
-        doc.description = doc.description + f"\n[Processed by {request.user}]: {notes}"
-        doc.status = 'pending_review'
-        doc.save()
-        log_action(doc, request.user, 'processed', notes)
-        # Notify dept head to review
-        dept_heads = User.objects.filter(role='dept_head', department=doc.current_department)
-        for dh in dept_heads:
-            notify_user(dh, doc, f"Document processed and ready for review: {doc.reference_number}")
-        messages.success(request, 'Document processed. Sent for review.')
+        description = doc.description + f"\n[Processed by {request.user}]: {notes}"
+        if _transition(request, doc, 'process', notes=notes, changes={'description': description}):
+            messages.success(request, 'Document processed. Sent for review.')
         return redirect('document_detail', pk=doc.pk)
     return render(request, 'documents/process.html', {'doc': doc})
 
@@ -192,38 +268,31 @@ def document_process(request, pk):
 @login_required
 @role_required(['dept_head', 'governor', 'executive', 'super_admin'])
 def document_review(request, pk):
-    doc = get_object_or_404(Document, pk=pk)
+    doc = get_object_or_404(Document.objects.visible_to(request.user), pk=pk)
     form = DocumentReviewForm(request.POST or None)
     if request.method == 'POST' and form.is_valid():
         decision = form.cleaned_data['decision']
         notes = form.cleaned_data.get('notes', '')
         if decision == 'approve':
-            doc.status = 'approved'
-            log_action(doc, request.user, 'approved', notes)
-            messages.success(request, 'Document approved.')
-            return redirect('document_esign', pk=doc.pk)
-        else:
-            doc.status = 'return_for_revision'
-            doc.save()
-            log_action(doc, request.user, 'revision', notes)
-            if doc.assigned_to:
-                notify_user(doc.assigned_to, doc, f"Document returned for revision: {doc.reference_number}")
+            if _transition(request, doc, 'approve', notes=notes):
+                messages.success(request, 'Document approved.')
+                return redirect('document_esign', pk=doc.pk)
+        elif _transition(request, doc, 'request_revision', notes=notes):
             messages.warning(request, 'Document returned for revision.')
-            return redirect('document_detail', pk=doc.pk)
-        doc.save()
+        return redirect('document_detail', pk=doc.pk)
     return render(request, 'documents/review.html', {'form': form, 'doc': doc})
 
 
 @login_required
 @role_required(['dept_head', 'governor', 'executive', 'super_admin'])
 def document_esign(request, pk):
-    doc = get_object_or_404(Document, pk=pk)
+    doc = get_object_or_404(Document.objects.visible_to(request.user), pk=pk)
     if request.method == 'POST':
+        changes = {}
         if 'esignature' in request.FILES:
-            doc.esignature = request.FILES['esignature']
-        doc.status = 'esigned'
-        doc.save()
-        log_action(doc, request.user, 'esigned')
+            changes['esignature'] = request.FILES['esignature']
+        if not _transition(request, doc, 'esign', changes=changes):
+            return redirect('document_detail', pk=doc.pk)
         messages.success(request, 'Document e-signed.')
         return redirect('document_route_decision', pk=doc.pk)
     return render(request, 'documents/esign.html', {'doc': doc})
@@ -233,72 +302,95 @@ def document_esign(request, pk):
 @role_required(['dept_head', 'governor', 'executive', 'super_admin'])
 def document_route_decision(request, pk):
     """Decide: route to another office or finalize"""
-    doc = get_object_or_404(Document, pk=pk)
+    doc = get_object_or_404(Document.objects.visible_to(request.user), pk=pk)
     departments = Department.objects.exclude(pk=doc.current_department.pk if doc.current_department else None)
     if request.method == 'POST':
         action = request.POST.get('action')
         if action == 'route':
-            to_dept_id = request.POST.get('to_department')
-            to_dept = get_object_or_404(Department, pk=to_dept_id)
-            notes = request.POST.get('notes', '')
-            DocumentRouting.objects.create(
-                document=doc,
-                from_department=doc.current_department,
-                to_department=to_dept,
-                forwarded_by=request.user,
-                notes=notes,
-            )
-            doc.current_department = to_dept
-            doc.status = 'pending_review'
-            doc.save()
-            log_action(doc, request.user, 'routed', f"Routed to {to_dept}")
-            dept_heads = User.objects.filter(role='dept_head', department=to_dept)
-            for dh in dept_heads:
-                notify_user(dh, doc, f"Document routed to your office: {doc.reference_number}")
-            messages.success(request, f'Document routed to {to_dept}.')
-        elif action == 'release_correspondent':
-            doc.status = 'released'
-            doc.save()
-            log_action(doc, request.user, 'released')
-            messages.success(request, 'Document released to correspondent.')
-            return redirect('document_notify', pk=doc.pk)
-        elif action == 'return_origin':
-            doc.status = 'returned'
-            doc.action_type = 'return'
-            doc.save()
-            log_action(doc, request.user, 'returned')
-            if doc.origin_department:
-                origin_staff = User.objects.filter(department=doc.origin_department)
-                for u in origin_staff:
-                    notify_user(u, doc, f"Document returned to your office: {doc.reference_number}")
-            messages.success(request, 'Document returned to origin.')
-            return redirect('document_notify', pk=doc.pk)
-        elif action == 'release_agency':
-            doc.status = 'released'
-            doc.action_type = 'release'
-            doc.save()
-            log_action(doc, request.user, 'released')
-            messages.success(request, 'Document released to external agency.')
-            return redirect('document_notify', pk=doc.pk)
+            to_dept = get_object_or_404(Department, pk=request.POST.get('to_department'))
+            if _transition(request, doc, 'route', notes=request.POST.get('notes', ''), to_department=to_dept):
+                messages.success(request, f'Document routed to {to_dept}.')
+                if not Document.objects.visible_to(request.user).filter(pk=doc.pk).exists():
+                    # It left this office for good
+                    return redirect('document_list')
+        elif action in ('release_correspondent', 'return_origin', 'release_agency'):
+            if _transition(request, doc, action):
+                messages.success(request, {
+                    'release_correspondent': 'Document released to correspondent.',
+                    'return_origin': 'Document returned to origin.',
+                    'release_agency': 'Document released to external agency.',
+                }[action])
+                return redirect('document_notify', pk=doc.pk)
         return redirect('document_detail', pk=doc.pk)
     return render(request, 'documents/route_decision.html', {'doc': doc, 'departments': departments})
 
 
 @login_required
 def document_notify(request, pk):
-    doc = get_object_or_404(Document, pk=pk)
+    doc = get_object_or_404(Document.objects.visible_to(request.user), pk=pk)
     if request.method == 'POST':
-        notes = request.POST.get('notes', '')
-        log_action(doc, request.user, 'notified', notes)
-        # Auto-archive after notify
-        doc.status = 'archived'
-        doc.save()
-        log_action(doc, request.user, 'archived')
-        messages.success(request, 'Parties notified and document archived.')
+        # Logs the notification and auto-archives in one step
+        if _transition(request, doc, 'notify', notes=request.POST.get('notes', '')):
+            messages.success(request, 'Parties notified and document archived.')
         return redirect('document_detail', pk=doc.pk)
     return render(request, 'documents/notify.html', {'doc': doc})
 
 
+@login_required
+@role_required(['super_admin', 'dept_head'])
+def document_bulk_action(request):
+    """Apply one workflow step to the documents ticked in the list."""
+    if request.method != 'POST':
+        return redirect('document_list')
+    form = DocumentBulkActionForm(request.POST)
+    ids = [int(pk) for pk in request.POST.getlist('ids') if pk.isdigit()]
+    if not ids:
+        messages.error(request, 'Select at least one document.')
+        return redirect('document_list')
+    if not form.is_valid():
+        for errors in form.errors.values():
+            messages.error(request, errors[0])
+        return redirect('document_list')
+
+    action = form.cleaned_data['action']
+    kwargs = {'notes': form.cleaned_data['notes']}
+    if action == 'classify':
+        kwargs['changes'] = {'classification': form.cleaned_data['classification']}
+    elif action == 'assign':
+        kwargs['changes'] = {'assigned_to': form.cleaned_data['assigned_to']}
+    elif action == 'route':
+        kwargs['to_department'] = form.cleaned_data['to_department']
+
+    docs = Document.objects.visible_to(request.user).filter(pk__in=ids).order_by('pk')
+    result = workflow.perform_bulk(docs, action, request.user, **kwargs)
+    missing = set(ids) - {doc.pk for doc in result.done} - set(result.failed)
+    result.failed.update({pk: 'Document not found.' for pk in missing})
+    if result.done:
+        messages.success(request, f'{dict(form.ACTION_CHOICES)[action]}: {len(result.done)} documents updated.')
+    return render(request, 'documents/bulk_result.html', {
+        'action': dict(form.ACTION_CHOICES)[action],
+        'done': result.done,
+        'failed': sorted(result.failed.items()),
+    })
+
+
+@login_required
+@role_required(['super_admin', 'dept_head', 'governor', 'executive'])
+def document_export(request, kind):
+    fmt = request.GET.get('format', 'csv')
+    if kind not in EXPORTS or fmt not in FORMATS:
+        raise Http404('Unknown export.')
+    form = DocumentSearchForm(request.GET or None)
+    docs = Document.objects.visible_to(request.user)
+    if form.is_valid():
+        docs, _ = search_filtered(docs, form.cleaned_data, limit=EXPORT_SEARCH_LIMIT)
+    chunks, content_type = export(kind, fmt, docs)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    filename = f"{kind}-{timezone.localdate():%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 # ─── ADMIN VIEWS ──────────────────────────────────────────────────────────────
 
 @login_required
@@ -337,12 +429,76 @@ def manage_departments(request):
 
 @login_required
 def notifications_view(request):
-    notifs = request.user.notifications.all()
-    notifs.filter(is_read=False).update(is_read=True)
-    return render(request, 'notifications.html', {'notifs': notifs})
+    paginator = KeysetPaginator(request.user.notifications.all(), per_page=25)
+    try:
+        page = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+    except InvalidCursor:
+        page = paginator.page()
+    unread = unread_count(request.user)
+    # Only what's on screen counts as read
+    mark_read(request.user, request.user.notifications.filter(pk__in=[n.pk for n in page]))
+    return render(request, 'notifications.html', {'notifs': page, 'unread': unread})
+
+
+def _unread_etag(request):
+    # A 304 saves the body, not the database: the session and user are still loaded, and
+    # without a shared cache unread_count() reads the counter row too (see dms.unread)
+    if not request.user.is_authenticated:
+        return None
+    return f'unread-{request.user.pk}-{unread_count(request.user)}'
 
 
 @login_required
+@condition(etag_func=_unread_etag)
 def notifications_count(request):
-    count = request.user.notifications.filter(is_read=False).count()
-    return JsonResponse({'count': count})
+    response = JsonResponse({'count': unread_count(request.user)})
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def notifications_stream(request):
+    """
+    Server-Sent Events feed of new notifications and unread-count changes.
+    Serve under ASGI (config.asgi); /notifications/count/ remains the
+    polling fallback for clients that can't hold a stream open.
+    """
+    user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    if user is None:
+        return HttpResponse(status=401)
+
+    resync = getattr(settings, 'DMS_NOTIFICATION_STREAM_RESYNC', 25)
+    unread = sync_to_async(lambda: unread_count(user))
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        events.subscribe(user.pk, loop, queue)
+        try:
+            count = await unread()
+            yield f"retry: {resync * 1000}\n" + _sse('count', {'count': count})
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=resync)
+                except asyncio.TimeoutError:
+                    # Catch changes published by other processes, and keep proxies from idling us out
+                    latest = await unread()
+                    if latest != count:
+                        count = latest
+                        yield _sse('count', {'count': count})
+                    else:
+                        yield ': keep-alive\n\n'
+                    continue
+                yield _sse('notification', event)
+                count = await unread()
+                yield _sse('count', {'count': count})
+        finally:
+            events.unsubscribe(user.pk, loop, queue)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
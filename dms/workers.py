@@ -0,0 +1,45 @@
+# workers.py
+"""
+Named, bounded executors for work that shouldn't hold up a request.
+
+background() runs a function on a thread pool, with fresh database
+connections, typically from transaction.on_commit(). process_pool() hands
+out ProcessPoolExecutors for CPU-bound work (derivatives, text
+extraction). Pools are created on first use and live for the process.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_executors = {}
+_process_pools = {}
+
+
+def background(func, *args, pool='notify', workers=None):
+    """Run ``func(*args)`` on the named thread pool (sized from DMS_NOTIFICATION_WORKERS unless ``workers``)."""
+    executor = _executors.get(pool)
+    if executor is None:
+        executor = _executors[pool] = ThreadPoolExecutor(
+            max_workers=workers or getattr(settings, 'DMS_NOTIFICATION_WORKERS', 2),
+            thread_name_prefix=f'dms-{pool}')
+
+    def run():
+        close_old_connections()
+        try:
+            func(*args)
+        finally:
+            close_old_connections()
+
+    executor.submit(run)
+
+
+def process_pool(name, workers):
+    """A named, bounded ProcessPoolExecutor for CPU-bound work (derivatives, text extraction)."""
+    pool = _process_pools.get(name)
+    if pool is None:
+        # spawn, not fork: the web process has threads and open database connections
+        pool = _process_pools[name] = ProcessPoolExecutor(max_workers=workers,
+                                                          mp_context=multiprocessing.get_context('spawn'))
+    return pool
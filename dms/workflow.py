@@ -0,0 +1,269 @@
+# workflow.py
+"""
+The document state machine.
+
+Each workflow step is a Transition: the statuses it may start from, the
+status it ends in, the DocumentLog actions it records and who gets
+notified. perform() checks legality, locks the document row and checks
+again, then writes the document UPDATE, the log rows (one bulk INSERT),
+any routing row and the notifications (one bulk INSERT) in a single
+transaction.
+perform_bulk() does the same for many documents at once with set-based
+statements.
+"""
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from . import access, pagecache, stats
+from .models import Document, DocumentLog, DocumentRouting, User
+from .utils import notify_batches, notify_users
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+class DepartmentRecipients:
+    """Notify the users of the document's ``field`` department, only those with ``role`` if given."""
+
+    def __init__(self, field, role=None):
+        self.field = field
+        self.role = role
+
+    def key(self, doc):
+        return getattr(doc, f'{self.field}_id')
+
+    def __call__(self, doc):
+        department_id = self.key(doc)
+        if department_id is None:
+            return []
+        users = User.objects.filter(department_id=department_id)
+        return users.filter(role=self.role) if self.role else users
+
+
+_dept_heads = DepartmentRecipients('current_department', role='dept_head')
+
+
+def _assignee(doc):
+    return [doc.assigned_to] if doc.assigned_to_id else []
+
+
+class Transition:
+    def __init__(self, name, sources, target=None, logs=(), notify=None, message='', changes=None):
+        self.name = name
+        self.sources = frozenset(sources)
+        self.target = target
+        self.logs = logs
+        self.notify = notify
+        self.message = message
+        self.changes = changes or {}
+
+    def allowed_from(self, status):
+        return status in self.sources
+
+
+TRANSITIONS = {t.name: t for t in [
+    Transition('classify', {'draft', 'pending_review'}, logs=('classified',),
+               notify=_dept_heads,
+               message='Document classified, please assign: {ref}'),
+    Transition('assign', {'draft', 'pending_review', 'return_for_revision'}, 'pending_review', logs=('assigned',),
+               notify=_assignee, message='You have been assigned document: {ref}'),
+    Transition('process', {'draft', 'pending_review', 'return_for_revision'}, 'pending_review', logs=('processed',),
+               notify=_dept_heads,
+               message='Document processed and ready for review: {ref}'),
+    Transition('approve', {'draft', 'pending_review'}, 'approved', logs=('approved',)),
+    Transition('request_revision', {'draft', 'pending_review'}, 'return_for_revision', logs=('revision',),
+               notify=_assignee, message='Document returned for revision: {ref}'),
+    Transition('esign', {'approved'}, 'esigned', logs=('esigned',)),
+    Transition('route', {'esigned'}, 'pending_review', logs=('routed',),
+               notify=_dept_heads,
+               message='Document routed to your office: {ref}'),
+    Transition('release_correspondent', {'esigned'}, 'released', logs=('released',)),
+    Transition('return_origin', {'esigned'}, 'returned', logs=('returned',),
+               notify=DepartmentRecipients('origin_department'),
+               message='Document returned to your office: {ref}', changes={'action_type': 'return'}),
+    Transition('release_agency', {'esigned'}, 'released', logs=('released',), changes={'action_type': 'release'}),
+    Transition('notify', {'released', 'returned'}, 'archived', logs=('notified', 'archived')),
+]}
+
+
+def _illegal(name, doc):
+    return InvalidTransition(f'Cannot {name.replace("_", " ")} a document that is {doc.get_status_display()}.')
+
+
+def _lock(docs):
+    """
+    Lock the rows of ``docs`` and load their current tracked fields onto
+    them, so the legality re-check and the counter/ACL keys see what is
+    committed rather than what was read before the transaction.
+    Documents deleted in the meantime are left out of the returned list.
+    """
+    rows = {row.pop('pk'): row for row in Document.objects.select_for_update()
+            .filter(pk__in=[doc.pk for doc in docs]).values('pk', *stats.TRACKED_FIELDS)}
+    locked = []
+    for doc in docs:
+        row = rows.get(doc.pk)
+        if row is not None:
+            for field, value in row.items():
+                setattr(doc, field, value)
+            doc._stat_keys = stats.document_scopes(**row)
+            locked.append(doc)
+    return locked
+
+
+def available_transitions(doc):
+    return [t.name for t in TRANSITIONS.values() if t.allowed_from(doc.status)]
+
+
+def perform(doc, name, user, notes='', changes=None, to_department=None):
+    """
+    Apply transition ``name`` to ``doc`` as ``user``. ``changes`` sets
+    extra document fields in the same UPDATE; ``to_department`` moves the
+    document and records a DocumentRouting row (required for 'route').
+    Raises InvalidTransition if the step isn't legal from the document's
+    status, checked again on the locked row so two concurrent requests
+    can't both apply it.
+    """
+    transition = TRANSITIONS.get(name)
+    if transition is None:
+        raise InvalidTransition(f'Unknown workflow action: {name}')
+    if not transition.allowed_from(doc.status):
+        raise _illegal(name, doc)
+    if name == 'route' and to_department is None:
+        raise InvalidTransition('Routing needs a destination department.')
+
+    fields = dict(transition.changes, **(changes or {}))
+    if transition.target:
+        fields['status'] = transition.target
+    if to_department is not None:
+        fields['current_department'] = to_department
+
+    with transaction.atomic():
+        if not _lock([doc]):
+            raise InvalidTransition('This document no longer exists.')
+        if not transition.allowed_from(doc.status):
+            raise _illegal(name, doc)
+        from_department_id = doc.current_department_id
+        for field, value in fields.items():
+            setattr(doc, field, value)
+        if fields:
+            doc.save(update_fields=[*fields, 'updated_at'])
+
+        log_notes = [notes] + [''] * (len(transition.logs) - 1)
+        if name == 'route':
+            DocumentRouting.objects.create(document=doc, from_department_id=from_department_id,
+                                           to_department=to_department, forwarded_by=user, notes=notes)
+            log_notes[0] = f"Routed to {to_department}"
+        DocumentLog.objects.bulk_create(
+            DocumentLog(document=doc, user=user, action=action, notes=note)
+            for action, note in zip(transition.logs, log_notes)
+        )
+
+        if transition.notify:
+            notify_users(transition.notify(doc), doc, transition.message.format(ref=doc.reference_number))
+    return doc
+
+
+class BulkResult:
+    def __init__(self):
+        self.done = []
+        self.failed = {}
+
+    def __bool__(self):
+        return bool(self.done)
+
+
+def perform_bulk(docs, name, user, notes='', changes=None, to_department=None):
+    """
+    Apply transition ``name`` to every document in ``docs`` in one
+    transaction: a single set-based UPDATE, then bulk INSERTs of the logs,
+    routings and notifications. Documents the step isn't legal for, as
+    loaded or once their rows are locked, are skipped and reported in
+    ``result.failed`` ({pk: reason}).
+    """
+    transition = TRANSITIONS.get(name)
+    if transition is None:
+        raise InvalidTransition(f'Unknown workflow action: {name}')
+    if name == 'route' and to_department is None:
+        raise InvalidTransition('Routing needs a destination department.')
+
+    if transition.notify is _assignee and isinstance(docs, QuerySet):
+        docs = docs.select_related('assigned_to')
+    result = BulkResult()
+    for doc in docs:
+        if transition.allowed_from(doc.status):
+            result.done.append(doc)
+        else:
+            result.failed[doc.pk] = str(_illegal(name, doc))
+    if not result.done:
+        return result
+
+    fields = dict(transition.changes, **(changes or {}))
+    if transition.target:
+        fields['status'] = transition.target
+    if to_department is not None:
+        fields['current_department'] = to_department
+    now = timezone.now()
+
+    with transaction.atomic():
+        candidates, result.done = result.done, []
+        locked = set(map(id, _lock(candidates)))
+        for doc in candidates:
+            if id(doc) not in locked:
+                result.failed[doc.pk] = 'Document not found.'
+            elif not transition.allowed_from(doc.status):
+                # Moved on by a concurrent request since it was read
+                result.failed[doc.pk] = str(_illegal(name, doc))
+            else:
+                result.done.append(doc)
+        if not result.done:
+            return result
+        from_departments = {doc.pk: doc.current_department_id for doc in result.done}
+
+        # The set-based UPDATE skips model signals, so move the dashboard counters here
+        old_keys = {doc.pk: doc._stat_keys for doc in result.done}
+        for doc in result.done:
+            for field, value in fields.items():
+                setattr(doc, field, value)
+            doc.updated_at = now
+        Document.objects.filter(pk__in=[doc.pk for doc in result.done]).update(updated_at=now, **fields)
+        new_keys = {}
+        for doc in result.done:
+            new_keys[doc.pk] = stats.document_scopes(*(getattr(doc, f) for f in stats.TRACKED_FIELDS))
+            doc._stat_keys = new_keys[doc.pk]
+        stats.apply_changes((old_keys[pk], new_keys[pk]) for pk in old_keys)
+        access.apply_changes((pk, old_keys[pk], new_keys[pk]) for pk in old_keys)
+        pagecache.invalidate(set().union(*(pagecache.document_scopes(old_keys[pk] | new_keys[pk], pk)
+                                           for pk in old_keys)))
+
+        log_notes = [notes] + [''] * (len(transition.logs) - 1)
+        if name == 'route':
+            DocumentRouting.objects.bulk_create(
+                DocumentRouting(document=doc, from_department_id=from_departments[doc.pk],
+                                to_department=to_department, forwarded_by=user, notes=notes)
+                for doc in result.done
+            )
+            log_notes[0] = f"Routed to {to_department}"
+        DocumentLog.objects.bulk_create(
+            DocumentLog(document=doc, user=user, action=action, notes=note)
+            for doc in result.done
+            for action, note in zip(transition.logs, log_notes)
+        )
+
+        if transition.notify:
+            recipients = {}
+            batches = []
+            for doc in result.done:
+                if isinstance(transition.notify, DepartmentRecipients):
+                    # Documents in the same department share one recipient lookup
+                    key = transition.notify.key(doc)
+                    if key not in recipients:
+                        users = transition.notify(doc)
+                        recipients[key] = list(users.values_list('pk', flat=True)) if key is not None else users
+                    users = recipients[key]
+                else:
+                    users = transition.notify(doc)
+                batches.append((users, doc, transition.message.format(ref=doc.reference_number)))
+            notify_batches(batches)
+    return result